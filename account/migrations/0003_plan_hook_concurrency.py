@@ -0,0 +1,18 @@
+# Generated by Django 4.2.17 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0002_remove_user_merge_credits_subscription_merge_credits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plan',
+            name='hook_concurrency',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 
+from utils.encoding import ENCODING_PROFILE_CHOICES
+
 class CustomUserManager(BaseUserManager):
     """Manager for custom user model with email as the unique identifier."""
 
@@ -27,6 +29,12 @@ class Plan(models.Model):
     price = models.DecimalField(max_digits=5, decimal_places=2, null=True)
     price_per_hook = models.DecimalField(max_digits=5, decimal_places=2, null=True)
     hook_limit = models.IntegerField(default=0)
+    # Hooks rendered at the same time for this plan; empty means auto-tune.
+    hook_concurrency = models.PositiveSmallIntegerField(blank=True, null=True)
+    # Encoder profile for this plan's renders; empty means the pipeline default.
+    encoding_profile = models.CharField(
+        max_length=20, choices=ENCODING_PROFILE_CHOICES, blank=True, null=True
+    )
 
 class StripeCustomer(models.Model):
     """Model representing a Stripe customer."""
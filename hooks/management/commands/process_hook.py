@@ -6,21 +6,34 @@ from django.core.management.base import BaseCommand
 from django.core.files.base import File        
 import logging
 import os
-import threading
 
 from hooks.models import Hook, HookVideoLink
 
 from tqdm import tqdm
-import pandas as pd
-from moviepy.editor import AudioFileClip
 
+from django.conf import settings
 from django.core.cache import cache
 from django.http import JsonResponse
 
+from utils.encoding import resolve_encoding_profile
+from utils.probe import file_content_hash
 from hooks.tools.utils import hex_to_rgb, handle_task_cancellation, delete_temp_dir
-from hooks.tools.spreadsheet_extractor import fetch_google_sheet_data, extract_word_color_data
-from hooks.tools.audio_processors import process_audios
-from hooks.tools.video_processors import process_audio_on_videos
+from hooks.tools.sheet_cache import SheetRowStream
+from hooks.tools.audio_processors import generate_hook_audio
+from hooks.tools.fingerprint import ExistingOutputs, row_fingerprint, sources_hash
+from hooks.tools.font_utils import get_font_registry
+from hooks.tools.tts_client import get_tts_client
+from hooks.tools.layout import HookStyle, LayoutRow, compute_hook_layout
+from hooks.tools.render_jobs import RenderJob, render_job
+from hooks.tools.rows import HookRow
+from hooks.tools.scheduler import (
+    PROCESS_BACKEND, RenderScheduler, RowResult, stream_stage
+)
+from hooks.tools.video_processors import get_text_renderer
+from hooks.tools.sprites import prewarm_sprites
+from hooks.tools.concurrency import (
+    resolve_parallel_executions, peak_memory_mb, render_costs
+)
 
 import os
 import sys
@@ -56,6 +69,7 @@ class Command(BaseCommand):
         task_id = kwargs["task_id"]
         self.hook= Hook.objects.get(id=task_id)
         self.update_progress(1)
+        prewarm_sprites()
         processing=self.background_processing()
         self.stdout.write(
             self.style.SUCCESS(f"Processing complete for {task_id}.")
@@ -66,22 +80,13 @@ class Command(BaseCommand):
         task_id = params.get('task_id', self.hook.id)
 
         try:
-            input_df = params['input_df']
-            if 'Hook Text' not in input_df.columns:
-                raise Exception("The column 'Hook Text' does not exist in the DataFrame.")
-
             google_sheet_link = params.get('google_sheet_link')
             if not google_sheet_link:
                 raise Exception("Missing 'google_sheet_link' in params.")
 
-            word_color_data = extract_word_color_data(google_sheet_link)
-            per_video=int(45/len(input_df))
-
-            for idx, row in input_df.iterrows():
-                hook_text = row['Hook Text']
+            sheet_rows = params['sheet_rows']
 
             ELEVENLABS_API_KEY = params['api_key']
-            no_of_parallel_executions = params['parallel_processing']
 
             INPUT_DIR = params['input_dir']
             OUTPUT_DIR = params['output_dir']
@@ -120,100 +125,180 @@ class Command(BaseCommand):
                 ]
             )
 
-            for col in ["Hook Video Filename", "Input Video Filename", "Audio Filename",
-                        "Voice"]:
-                if col not in input_df.columns:
-                    input_df[col] = ''
-
-            l_unprocessed_rows = len(input_df[input_df['Hook Video Filename'] == ''])
-
-            all_hooks = []
-            total_rows = len(input_df)
-            current_row = 0
-
-            for idx_1, row in tqdm(input_df.iterrows(), total=total_rows,desc="Processing rows"):
-                hook_text = row['Hook Text']
-                hook_number = idx_1 + 1
+            baseline_memory_mb = peak_memory_mb()
 
-                process_audios(
-                    ELEVENLABS_API_KEY, row, hook_number, hook_text, input_df, idx_1,
-                    output_audios_folder, voice_id
-                )
-                
-                logging.info('Audio proccessed successfully')
+            self.update_progress(20)
 
-            current_thread_count = 0
+            encoding_profile = resolve_encoding_profile(
+                self.hook, settings.HOOK_ENCODING_PROFILE
+            ).name
+            style = HookStyle(top_box_color, default_text_color, is_tiktok)
+
+            # Rows whose inputs match a video of an earlier run keep it
+            source_hash = sources_hash([
+                file_content_hash(os.path.join(input_videos_folder, f))
+                for f in video_files
+            ])
+            text_renderer = get_text_renderer().name
+            font_hash = get_font_registry().font_hash
+            existing_outputs = ExistingOutputs(self.hook)
+
+            no_of_parallel_executions = resolve_parallel_executions(
+                self.hook, OUT_VIDEO_WIDTH, OUT_VIDEO_HEIGHT,
+                sheet_rows.total_estimate()
+            )
+            logging.info(f"Rendering hooks with {no_of_parallel_executions} workers")
 
-            self.update_progress(20)
-            for idx, row in tqdm(input_df.iterrows(), total=total_rows,desc="Processing rows"):
-                hook_text = row['Hook Text']
-                hook_number = idx + 1
+            # Every row cuts its background from the same sources
+            source_plan = tuple(
+                os.path.join(input_videos_folder, f) for f in video_files
+            )
 
-                audio_clip = AudioFileClip(
-                    os.path.join(output_audios_folder, row['Audio Filename'])
-                )
-                video_index = idx % len(video_files)
-                num_videos_to_use = int(round(audio_clip.duration / 2))
+            # Sheet rows still to render, as they come in page by page
+            rows = {}
+            # Rows that failed before reaching the renderers
+            failed_rows = []
+
+            def pending_rows():
+                for idx, values, word_colors in sheet_rows:
+                    row = HookRow.from_sheet_row(idx, values, word_colors, source_plan)
+                    if row is None:
+                        continue
+                    row.fingerprint = row_fingerprint(
+                        row.text, row.word_runs, voice_id, source_hash,
+                        OUT_VIDEO_WIDTH, OUT_VIDEO_HEIGHT, params['add_watermark'],
+                        top_box_color, default_text_color, self.hook.render_engine,
+                        encoding_profile, text_renderer, font_hash,
+                    )
+                    if existing_outputs.claim(idx, row.fingerprint):
+                        logging.info(f"Hook {idx + 1} is unchanged, keeping its video")
+                        continue
+                    try:
+                        row.layout = compute_hook_layout(
+                            LayoutRow(row.text, row.word_runs),
+                            (OUT_VIDEO_WIDTH, OUT_VIDEO_HEIGHT), style
+                        )
+                    except Exception as err:
+                        logging.error(f"Hook {idx + 1} could not be laid out --> {err}")
+                        failed_rows.append(RowResult(idx, None, err, 0.0))
+                        continue
+                    rows[idx] = row
+                    yield idx, (
+                        ELEVENLABS_API_KEY, row.text, idx + 1,
+                        output_audios_folder, voice_id
+                    )
 
-                video_file_size = len(video_files)
-                if num_videos_to_use + video_index > video_file_size:
-                    num_videos_to_use = video_file_size - video_index
+            def should_cancel():
+                return params['task_id'] in canceled_tasks
+
+            # Voiceovers are generated on their own threads; a row is handed
+            # to the renderers as soon as its audio is ready.
+            voiced_rows = stream_stage(
+                pending_rows(),
+                generate_hook_audio,
+                get_tts_client().key_concurrency(ELEVENLABS_API_KEY),
+                should_cancel=should_cancel,
+                name='tts',
+            )
 
-                last_video = video_index + num_videos_to_use
-                video_files_to_use = [
-                    os.path.join(input_videos_folder, video_files[i])
-                    for i in range(video_index, last_video)
-                ]
+            def render_jobs():
+                for result in tqdm(voiced_rows, desc="Processing rows"):
+                    if result.error is not None:
+                        failed_rows.append(result)
+                        continue
+                    idx = result.idx
+                    audio_filename, _ = result.output
+                    row = rows[idx]
+                    row.audio_path = os.path.join(output_audios_folder, audio_filename)
+                    logging.info(f'Audio of hook {idx + 1} proccessed successfully')
+                    job = RenderJob(
+                        idx=idx,
+                        hook_text=row.text,
+                        audio_path=row.audio_path,
+                        source_videos=row.source_plan,
+                        width=OUT_VIDEO_WIDTH,
+                        height=OUT_VIDEO_HEIGHT,
+                        output_videos_folder=output_videos_folder,
+                        total_rows=sheet_rows.total_estimate(),
+                        task_id=task_id,
+                        top_box_color=top_box_color,
+                        default_text_color=default_text_color,
+                        word_color_data=row.word_runs,
+                        add_watermark=params['add_watermark'],
+                        is_tiktok=is_tiktok,
+                        engine=self.hook.render_engine,
+                        layout=row.layout.to_dict(),
+                        encoding_profile=encoding_profile,
+                    )
+                    yield idx, (job,)
 
-                if params['task_id'] in canceled_tasks:
-                    return handle_task_cancellation(temp_dir, task_id)
-
-                hook_job = threading.Thread(
-                    target=process_audio_on_videos,
-                    args=(
-                    row, video_files_to_use, idx, input_df, hook_number, hook_text,
-                    num_videos_to_use, audio_clip, OUT_VIDEO_WIDTH, OUT_VIDEO_HEIGHT,
-                    output_videos_folder, total_rows, task_id, top_box_color,
-                    default_text_color, word_color_data, None, params['add_watermark'],
-                    is_tiktok
+            scheduler = RenderScheduler(
+                no_of_parallel_executions,
+                should_cancel=should_cancel,
+                backend=settings.HOOK_RENDER_BACKEND,
+            )
+            results = scheduler.run(render_jobs(), render_job)
+            results = sorted(results + failed_rows, key=lambda result: result.idx)
+            render_memory_mb = []
+            for result in results:
+                if result.error is None:
+                    render_costs.record_render(
+                        OUT_VIDEO_WIDTH, OUT_VIDEO_HEIGHT, result.output.wall_seconds,
+                        result.output.cpu_seconds
                     )
+                    if result.output.memory_mb is not None:
+                        render_memory_mb.append(result.output.memory_mb)
+            # Process workers report their own peak; thread workers share ours
+            if render_memory_mb:
+                render_costs.record_memory(
+                    OUT_VIDEO_WIDTH, OUT_VIDEO_HEIGHT, max(render_memory_mb)
+                )
+            elif scheduler.backend != PROCESS_BACKEND:
+                render_costs.record_memory(
+                    OUT_VIDEO_WIDTH, OUT_VIDEO_HEIGHT,
+                    (peak_memory_mb() - baseline_memory_mb) / no_of_parallel_executions
                 )
-                hook_job.start()
-                all_hooks.append(hook_job)
-                current_thread_count += 1
-                if current_thread_count == int(no_of_parallel_executions):
-                    for hook in all_hooks:
-                        hook.join()
-                    all_hooks.clear()
-                    current_thread_count = 0
-            for hook in all_hooks:
-                try:
-                    hook.join()
-                except Exception as err:
-                    logging.error(f'failed to join all hooks --> {str(err)}')
+            if scheduler.cancelled:
+                return handle_task_cancellation(temp_dir, task_id)
 
             # Now generate the video links after all processing is complete
             credits_used = 0
             video_links = []
-            for idx, row in input_df.iterrows():
+            for result in results:
+                if result.error is not None:
+                    logging.error(
+                        f"Hook {result.idx + 1} was not rendered and will not be charged --> {result.error}"
+                    )
+                    continue
                 logging.info('Trying to generate link')
-                row['Hook Video Filename'] = f'hook_{idx}.mp4'
-                video_path = os.path.join(
-                    output_videos_folder, row['Hook Video Filename']
-                )
+                output_path = result.output.path
+                rows[result.idx].output_path = output_path
                 video_links.append(
                     {
-                    'file_name': row['Hook Video Filename'],
-                    'video_link': video_path
+                    'file_name': os.path.basename(output_path),
+                    'video_link': output_path,
+                    'row_index': result.idx,
+                    'fingerprint': rows[result.idx].fingerprint,
                     }
                 )
                 credits_used += 1
                 logging.info("used one credit")
                 logging.info(
-                    f"Generated video link with file name: {row['Hook Video Filename']}"
+                    f"Generated video link with file name: {os.path.basename(output_path)}"
                 )
 
-            logging.info(f"Task {task_id} completed.")
+            # Renumber the videos that were kept and drop the ones no row uses
+            for idx, link in existing_outputs.kept.items():
+                if link.row_index != idx:
+                    link.row_index = idx
+                    link.save(update_fields=['row_index'])
+            for link in existing_outputs.stale():
+                link.delete()
+
+            logging.info(
+                f"Task {task_id} completed: {len(rows)} hooks rendered, "
+                f"{len(existing_outputs.kept)} unchanged."
+            )
             return video_links, credits_used
 
         except Exception as e:
@@ -263,22 +348,11 @@ class Command(BaseCommand):
                 destination.write(chunk)
         video_files_paths.append(video_file_path)
 
-        google_sheet_data = fetch_google_sheet_data(google_sheet_link)
-        extract_word_color_data(google_sheet_link)
-        input_df = pd.DataFrame(google_sheet_data)
+        # Rows are read page by page while the first hooks are processed;
+        # the first page is fetched here so a bad sheet fails right away
+        sheet_rows = SheetRowStream(google_sheet_link, settings.HOOK_SHEET_PAGE_ROWS)
         self.update_progress(15)
 
-        if input_df.empty or ('Hook Text' not in input_df.columns and input_df.shape[1] > 0):
-            if input_df.shape[1] == 1:
-                input_df.columns = ['Hook Text']
-            else:
-                return JsonResponse(
-                    {
-                    "error":
-                        "Ensure the google sheet access is updated to anyone with link."
-                    }
-                )
-
         # Create a params dictionary to pass to the background task
         params = {
             "input_dir": os.path.join(temp_dir, 'input'),
@@ -291,8 +365,8 @@ class Command(BaseCommand):
             "temp_dir": temp_dir,
             "top_box_color": top_box_color,
             "default_text_color": default_text_color,
-            "input_df": input_df,
             "google_sheet_link": google_sheet_link,
+            "sheet_rows": sheet_rows,
             "add_watermark": add_watermark,
             "aspect_ratio": aspect_ratio,
         }
@@ -329,7 +403,11 @@ class Command(BaseCommand):
                 if video_file_path:
                     with open(video_file_path, 'rb') as f:
                         file_content = File(f)
-                        hook_video_link =HookVideoLink.objects.create(hook=hook)
+                        hook_video_link =HookVideoLink.objects.create(
+                            hook=hook,
+                            row_index=video.get('row_index'),
+                            fingerprint=video.get('fingerprint'),
+                        )
                         hook_video_link.video_file.save(video_file_name,file_content)
 
             
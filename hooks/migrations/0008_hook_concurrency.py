@@ -0,0 +1,18 @@
+# Generated by Django 4.2.17 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hooks', '0007_delete_package_hook_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hook',
+            name='concurrency',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+    ]
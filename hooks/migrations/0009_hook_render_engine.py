@@ -0,0 +1,18 @@
+# Generated by Django 4.2.17 on 2026-10-18 10:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hooks', '0008_hook_concurrency'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hook',
+            name='render_engine',
+            field=models.CharField(choices=[('moviepy', 'moviepy'), ('ffmpeg', 'ffmpeg')], default='moviepy', max_length=20),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.17 on 2026-10-18 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hooks', '0010_hook_encoding_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hookvideolink',
+            name='fingerprint',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='hookvideolink',
+            name='row_index',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -3,6 +3,7 @@ from django.db import models
 from django.core.exceptions import ValidationError
 
 from merger.models import sanitize_filename
+from utils.encoding import ENCODING_PROFILE_CHOICES
 
 def validate_video_file(value):
     """
@@ -55,6 +56,9 @@ class Hook(models.Model):
     box_color = models.CharField(max_length=7, default='#485AFF')
     font_color = models.CharField(max_length=7, default='#FFFFFF')
     parallel_processing = models.BooleanField(default=False)
+    # Number of hooks rendered at the same time; empty means use the plan
+    # setting or auto-tune from the worker's cores and memory.
+    concurrency = models.PositiveSmallIntegerField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     # Choices for the dimension field
@@ -69,6 +73,21 @@ class Hook(models.Model):
         max_length=30, choices=STATUS_CHOICES, default='option1'
     )
     status = models.CharField(max_length=20, default='processing')
+
+    # Engine used to render the hook videos of this task
+    RENDER_ENGINE_CHOICES = [
+        ('moviepy', 'moviepy'),
+        ('ffmpeg', 'ffmpeg'),
+    ]
+
+    render_engine = models.CharField(
+        max_length=20, choices=RENDER_ENGINE_CHOICES, default='moviepy'
+    )
+    # Encoder settings for the output videos; empty means use the plan's
+    # profile or HOOK_ENCODING_PROFILE.
+    encoding_profile = models.CharField(
+        max_length=20, choices=ENCODING_PROFILE_CHOICES, blank=True, null=True
+    )
     
     def __str__(self):
         """Return a string representation of the Hook object."""
@@ -81,6 +100,10 @@ class Hook(models.Model):
 class HookVideoLink(models.Model):
     hook=models.ForeignKey(Hook,on_delete=models.CASCADE,related_name='video_links')
     video_file=models.FileField(upload_to=hook_video_link,null=True,blank=True)
+    # Sheet row the video was rendered from and a hash of that row's inputs,
+    # so a re-run can keep the videos whose inputs did not change.
+    row_index = models.PositiveIntegerField(blank=True, null=True)
+    fingerprint = models.CharField(max_length=64, blank=True, null=True)
 
     def delete(self, *args, **kwargs):
         if self.video_file:
@@ -1,3 +1,339 @@
-from django.test import TestCase
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+from PIL import Image
+
+from django.test import SimpleTestCase
+
+from hooks.tools.fingerprint import ExistingOutputs, row_fingerprint
+from hooks.tools.overlay import OverlayLayer
+from hooks.tools.scheduler import RenderScheduler
+from hooks.tools.sheet_cache import SheetRowStream
+from hooks.tools.spreadsheet_extractor import parse_sheet_snapshot
+from hooks.tools.text_layout import break_first_line, wrap_lines
+
+
+def monospace_width(text, size):
+    """Every character is half the font size wide."""
+    return len(text) * size / 2
+
+
+@mock.patch('hooks.tools.text_layout.text_width', side_effect=monospace_width)
+class LineBreakingTests(SimpleTestCase):
+    # At size 20 each character is 10px wide, so a 100px box holds 10.
+    SIZE = 20
+    MAX_WIDTH = 100
+
+    def test_text_that_fits_stays_on_one_line(self, _):
+        self.assertEqual(
+            break_first_line('short', self.SIZE, self.MAX_WIDTH), ('short', '')
+        )
+        self.assertEqual(wrap_lines('short', self.SIZE, self.MAX_WIDTH), ['short'])
+
+    def test_breaks_at_the_last_space_before_the_overflow(self, _):
+        self.assertEqual(
+            break_first_line('hello world again', self.SIZE, self.MAX_WIDTH),
+            ('hello', 'world again')
+        )
+
+    def test_wraps_greedily(self, _):
+        self.assertEqual(
+            wrap_lines(
+                'the quick brown fox jumps over the lazy dog',
+                self.SIZE, self.MAX_WIDTH
+            ),
+            ['the quick', 'brown fox', 'jumps over', 'the lazy', 'dog']
+        )
+
+    def test_smaller_size_fits_more_per_line(self, _):
+        self.assertEqual(
+            wrap_lines('hello world again', 10, self.MAX_WIDTH),
+            ['hello world again']
+        )
+
+    def test_word_wider_than_the_box_gets_its_own_line(self, _):
+        self.assertEqual(
+            break_first_line('abcdefghijklmnop', self.SIZE, self.MAX_WIDTH),
+            ('abcdefghijklmnop', '')
+        )
+        self.assertEqual(
+            wrap_lines('ab abcdefghijklmnop qr', self.SIZE, self.MAX_WIDTH),
+            ['ab', 'abcdefghijklmnop', 'qr']
+        )
+        self.assertEqual(
+            wrap_lines('abcdefghijklmnop qr stuvw', self.SIZE, self.MAX_WIDTH),
+            ['abcdefghijklmnop', 'qr stuvw']
+        )
+
+    def test_trailing_spaces_do_not_force_a_break(self, _):
+        self.assertEqual(
+            break_first_line('0123456789   ', self.SIZE, self.MAX_WIDTH),
+            ('0123456789   ', '')
+        )
+        self.assertEqual(
+            wrap_lines('  0123456789   ', self.SIZE, self.MAX_WIDTH),
+            ['0123456789']
+        )
+
+
+class RenderSchedulerTests(SimpleTestCase):
+
+    def jobs(self, count, pulled=None):
+        for idx in range(count):
+            if pulled is not None:
+                pulled.append(idx)
+            yield idx, (idx,)
+
+    def test_keeps_at_most_max_workers_in_flight(self):
+        lock = threading.Lock()
+        in_flight = [0]
+        peak = [0]
+        # The first three rows only finish once all three run at the same time
+        first_rows = threading.Barrier(3)
+
+        def render(idx):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            if idx < 3:
+                first_rows.wait(timeout=5)
+            time.sleep(0.01)
+            with lock:
+                in_flight[0] -= 1
+            return idx
+
+        results = RenderScheduler(3).run(self.jobs(12), render)
+
+        self.assertEqual([result.error for result in results], [None] * 12)
+        self.assertEqual(peak[0], 3)
+
+    def test_a_failing_row_does_not_stop_the_others(self):
+        def render(idx):
+            if idx == 2:
+                raise ValueError('bad row')
+            return f'hook_{idx}.mp4'
+
+        results = RenderScheduler(2).run(self.jobs(5), render)
+
+        self.assertEqual([result.idx for result in results], list(range(5)))
+        self.assertIsInstance(results[2].error, ValueError)
+        self.assertIsNone(results[2].output)
+        for result in results[:2] + results[3:]:
+            self.assertIsNone(result.error)
+            self.assertEqual(result.output, f'hook_{result.idx}.mp4')
+
+    def test_cancellation_stops_new_submissions(self):
+        pulled = []
+        scheduler = RenderScheduler(1, should_cancel=lambda: len(pulled) > 3)
+
+        results = scheduler.run(self.jobs(10, pulled), lambda idx: idx)
+
+        self.assertTrue(scheduler.cancelled)
+        self.assertEqual([result.idx for result in results], [0, 1, 2])
+        self.assertEqual(len(pulled), 4)
+
+
+class ExistingOutputsTests(SimpleTestCase):
+
+    def fingerprint(self, text, voice_id='voice', text_renderer='pango', font_hash='font'):
+        return row_fingerprint(
+            text, [], voice_id, 'sources', 1080, 1080, False,
+            (72, 90, 255), (255, 255, 255), 'ffmpeg', 'standard', text_renderer,
+            font_hash,
+        )
+
+    def hook_with_links(self, *links):
+        links = [
+            SimpleNamespace(
+                row_index=row_index, fingerprint=fingerprint,
+                video_file=f'hook_{row_index}.mp4' if has_file else None
+            )
+            for row_index, fingerprint, has_file in links
+        ]
+        hook = mock.Mock()
+        hook.video_links.order_by.return_value = links
+        return hook, links
+
+    def test_fingerprint_changes_with_the_row_inputs(self):
+        self.assertEqual(self.fingerprint('Hook one'), self.fingerprint('Hook one'))
+        self.assertNotEqual(self.fingerprint('Hook one'), self.fingerprint('Hook two'))
+        self.assertNotEqual(
+            self.fingerprint('Hook one'), self.fingerprint('Hook one', 'other voice')
+        )
+        self.assertNotEqual(
+            self.fingerprint('Hook one'),
+            self.fingerprint('Hook one', text_renderer='pillow')
+        )
+        self.assertNotEqual(
+            self.fingerprint('Hook one'), self.fingerprint('Hook one', font_hash='new font')
+        )
+
+    def test_unchanged_rows_keep_their_videos(self):
+        hook, links = self.hook_with_links(
+            (0, self.fingerprint('Hook one'), True),
+            (1, self.fingerprint('Hook two'), True),
+        )
+        outputs = ExistingOutputs(hook)
+
+        self.assertIs(outputs.claim(0, self.fingerprint('Hook one')), links[0])
+        self.assertIs(outputs.claim(1, self.fingerprint('Hook two')), links[1])
+        self.assertEqual(outputs.kept, {0: links[0], 1: links[1]})
+        self.assertEqual(outputs.stale(), [])
+
+    def test_changed_rows_are_rendered_again_and_their_old_video_dropped(self):
+        hook, links = self.hook_with_links(
+            (0, self.fingerprint('Hook one'), True),
+            (1, self.fingerprint('Hook two'), True),
+        )
+        outputs = ExistingOutputs(hook)
+
+        self.assertIs(outputs.claim(0, self.fingerprint('Hook one')), links[0])
+        self.assertIsNone(outputs.claim(1, self.fingerprint('Hook two, edited')))
+        self.assertEqual(outputs.stale(), [links[1]])
+
+    def test_deleted_rows_drop_their_videos_and_moved_rows_keep_theirs(self):
+        hook, links = self.hook_with_links(
+            (0, self.fingerprint('Hook one'), True),
+            (1, self.fingerprint('Hook two'), True),
+        )
+        outputs = ExistingOutputs(hook)
+
+        # The first row was deleted, so the second one moved up
+        self.assertIs(outputs.claim(0, self.fingerprint('Hook two')), links[1])
+        self.assertEqual(outputs.kept, {0: links[1]})
+        self.assertEqual(outputs.stale(), [links[0]])
+
+    def test_links_without_fingerprint_or_file_are_stale(self):
+        hook, links = self.hook_with_links(
+            (0, None, True),
+            (1, self.fingerprint('Hook two'), False),
+        )
+        outputs = ExistingOutputs(hook)
+
+        self.assertIsNone(outputs.claim(0, self.fingerprint('Hook one')))
+        self.assertIsNone(outputs.claim(1, self.fingerprint('Hook two')))
+        self.assertEqual(outputs.stale(), links)
+
+    def test_identical_rows_each_claim_their_own_video(self):
+        fingerprint = self.fingerprint('Same hook')
+        hook, links = self.hook_with_links(
+            (0, fingerprint, True),
+            (1, fingerprint, True),
+        )
+        outputs = ExistingOutputs(hook)
+
+        self.assertIs(outputs.claim(0, fingerprint), links[0])
+        self.assertIs(outputs.claim(1, fingerprint), links[1])
+        self.assertIsNone(outputs.claim(2, fingerprint))
+        self.assertEqual(outputs.stale(), [])
+
+
+def fake_sheet(cells, grid_rows):
+    """A fetch_sheet_snapshot reading column A `cells` of a `grid_rows` row grid."""
+    def fetch(google_sheet_link, first_row=0, row_count=None):
+        if first_row >= grid_rows:
+            raise Exception('Range exceeds grid limits')
+        rows = cells[first_row:first_row + row_count]
+        return parse_sheet_snapshot('sheet', {'sheets': [{
+            'properties': {'gridProperties': {'rowCount': grid_rows}},
+            'data': [{'rowData': [
+                {'values': [{
+                    'formattedValue': text,
+                    'effectiveValue': {'stringValue': text},
+                }]} if text else {}
+                for text in rows
+            ]}],
+        }]})
+    return fetch
+
+
+@mock.patch('hooks.tools.sheet_cache._store')
+@mock.patch('hooks.tools.sheet_cache._fresh_snapshot', return_value=None)
+class SheetRowStreamTests(SimpleTestCase):
+    LINK = 'https://docs.google.com/spreadsheets/d/sheet/edit'
+
+    def stream(self, cells, grid_rows, page_size):
+        with mock.patch(
+            'hooks.tools.spreadsheet_extractor.fetch_sheet_snapshot',
+            side_effect=fake_sheet(cells, grid_rows)
+        ):
+            stream = SheetRowStream(self.LINK, page_size)
+            rows = [(idx, values) for idx, values, _ in stream]
+        return stream, rows
+
+    def test_rows_after_a_blank_run_at_a_page_boundary_are_read(self, *_):
+        stream, rows = self.stream(['a', 'b', '', 'd', 'e'], 5, 3)
+
+        self.assertEqual(rows, [(0, ('a',)), (1, ('b',)), (3, ('d',)), (4, ('e',))])
+        self.assertEqual(
+            stream.snapshot.values, (('a',), ('b',), (), ('d',), ('e',))
+        )
+
+    def test_blank_pages_are_skipped_not_the_end(self, *_):
+        stream, rows = self.stream(['a', '', '', '', 'd'], 5, 2)
+
+        self.assertEqual(rows, [(0, ('a',)), (4, ('d',))])
+        self.assertEqual(stream.total_estimate(), 5)
+
+    def test_stops_at_the_end_of_the_grid(self, *_):
+        stream, rows = self.stream(['a', 'b', 'c', 'd', 'e', 'f'], 6, 3)
+
+        self.assertEqual([idx for idx, _ in rows], list(range(6)))
+
+    def test_row_count_is_exact_when_the_sheet_fits_one_page(self, _fresh, _store):
+        with mock.patch(
+            'hooks.tools.spreadsheet_extractor.fetch_sheet_snapshot',
+            side_effect=fake_sheet(['a', 'b', ''], 3)
+        ):
+            stream = SheetRowStream(self.LINK, 200)
+            self.assertEqual(stream.total_estimate(), 2)
+
+
+class OverlayLayerTests(SimpleTestCase):
+    WIDTH, HEIGHT = 64, 48
+
+    def setUp(self):
+        rng = np.random.default_rng(5)
+        rgba = rng.integers(0, 256, (self.HEIGHT, self.WIDTH, 4), dtype='uint8')
+        # Fully transparent and fully opaque areas, like text on a clear layer
+        rgba[:, :16, 3] = 0
+        rgba[:, -16:, 3] = 255
+        self.layer = OverlayLayer(rgba)
+        self.frame = rng.integers(0, 256, (self.HEIGHT, self.WIDTH, 3), dtype='uint8')
+
+    def assertWithinOneLSB(self, first, second):
+        difference = np.abs(first.astype('int16') - second.astype('int16'))
+        self.assertLessEqual(int(difference.max()), 1)
+
+    def test_straight_alpha_blend_matches_apply(self):
+        straight = self.layer.straight_rgba().astype('uint32')
+        alpha = straight[:, :, 3:4]
+        blended = (
+            straight[:, :, :3] * alpha + self.frame.astype('uint32') * (255 - alpha) + 127
+        ) // 255
+
+        self.assertWithinOneLSB(blended, self.layer.apply(self.frame))
+
+    @skipUnless(shutil.which('ffmpeg'), 'ffmpeg is not installed')
+    def test_ffmpeg_overlay_of_the_saved_png_matches_apply(self):
+        with tempfile.TemporaryDirectory() as directory:
+            background = os.path.join(directory, 'background.png')
+            Image.fromarray(self.frame, 'RGB').save(background)
+            overlay = self.layer.save_png(os.path.join(directory, 'overlay.png'))
+            result = subprocess.run([
+                'ffmpeg', '-v', 'error', '-i', background, '-i', overlay,
+                '-filter_complex', 'overlay=0:0:format=rgb',
+                '-frames:v', '1', '-f', 'rawvideo', '-pix_fmt', 'rgb24', 'pipe:',
+            ], stdout=subprocess.PIPE, check=True)
+
+        frame = np.frombuffer(result.stdout, dtype='uint8').reshape(self.frame.shape)
+        difference = np.abs(frame.astype('int16') - self.layer.apply(self.frame))
+        # ffmpeg rounds its blend a little differently from apply()
+        self.assertLessEqual(int(difference.max()), 2)
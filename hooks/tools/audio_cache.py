@@ -0,0 +1,43 @@
+# Content-addressed cache of synthesized hook voiceovers
+import hashlib
+import json
+import re
+
+from django.conf import settings
+
+from utils.blob_cache import BlobCache
+
+# Bump when the text normalization changes in a way that alters the audio.
+AUDIO_CACHE_VERSION = 1
+
+_audio_cache = None
+
+
+def normalize_tts_text(text, remove_punctuation=True):
+    """The text as it is sent to ElevenLabs."""
+    if remove_punctuation:
+        text = text.replace('-', ' ').replace('"', ' ').replace("'", ' ')
+        text = re.sub(r'[^\w\s]', '', text)
+    return text
+
+
+def tts_cache_key(voice_id, text, model_id, voice_settings):
+    """Hash everything that decides the audio of a voiceover."""
+    payload = json.dumps([
+        AUDIO_CACHE_VERSION, voice_id, text, model_id, voice_settings,
+    ], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def get_audio_cache():
+    """
+    Return the process-wide voiceover cache: local disk, backed by the media
+    bucket so re-runs and other workers never pay for the same audio twice.
+    """
+    global _audio_cache
+    if _audio_cache is None:
+        _audio_cache = BlobCache(
+            'audio', settings.HOOK_AUDIO_CACHE_DISK_MB * 1024 * 1024,
+            s3_prefix='cache/audio' if settings.HOOK_AUDIO_CACHE_S3 else None,
+        )
+    return _audio_cache
@@ -0,0 +1,176 @@
+# Utility functions used to pick how many hooks render at the same time
+import logging
+import math
+import os
+import resource
+import threading
+
+logging.basicConfig(level=logging.DEBUG)
+
+# Rough memory footprint of a single moviepy render before any measurement
+# exists: interpreter/clip overhead plus a handful of decoded RGB frames.
+BASE_RENDER_MEMORY_MB = 250
+BUFFERED_FRAMES_PER_RENDER = 48
+
+# Share of the host memory the render workers are allowed to use.
+MEMORY_HEADROOM = 0.8
+
+# Never oversubscribe the CPU by more than this factor, even when renders
+# spend most of their time waiting on ffmpeg.
+MAX_CPU_OVERCOMMIT = 2
+
+
+def available_cpus():
+    """Return the number of CPUs this process may run on, honouring cgroup quotas."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    # Containers (Modal, docker) expose the quota through cgroup v2.
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()[:2]
+        if quota != 'max':
+            cpus = min(cpus, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+
+    return max(1, cpus)
+
+
+def available_memory_mb():
+    """Return the memory (MB) still available to this container, or None if unknown."""
+    try:
+        with open('/sys/fs/cgroup/memory.max') as f:
+            limit = f.read().strip()
+        with open('/sys/fs/cgroup/memory.current') as f:
+            current = int(f.read().strip())
+        if limit != 'max':
+            return max(0, (int(limit) - current) / (1024 * 1024))
+    except (OSError, ValueError):
+        pass
+
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+
+    return None
+
+
+def peak_memory_mb():
+    """Return the peak resident memory of this process in MB."""
+    # ru_maxrss is reported in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def estimate_render_memory_mb(width, height):
+    """Estimate the memory one render needs for the given output dimensions."""
+    frame_mb = width * height * 3 / (1024 * 1024)
+    return BASE_RENDER_MEMORY_MB + frame_mb * BUFFERED_FRAMES_PER_RENDER
+
+
+class RenderCostTracker:
+    """
+    Keeps running averages of what a render actually costs in this worker,
+    per output dimension, so later tasks in a warm container tune from
+    measurements instead of estimates.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._costs = {}
+
+    def record_render(self, width, height, wall_seconds, cpu_seconds):
+        with self._lock:
+            cost = self._costs.setdefault(
+                (width, height),
+                {'renders': 0, 'wall': 0.0, 'cpu': 0.0, 'memory_mb': None}
+            )
+            cost['renders'] += 1
+            cost['wall'] += wall_seconds
+            cost['cpu'] += cpu_seconds
+
+    def record_memory(self, width, height, memory_mb):
+        with self._lock:
+            cost = self._costs.setdefault(
+                (width, height),
+                {'renders': 0, 'wall': 0.0, 'cpu': 0.0, 'memory_mb': None}
+            )
+            if memory_mb > 0:
+                cost['memory_mb'] = max(cost['memory_mb'] or 0, memory_mb)
+
+    def cpu_share(self, width, height):
+        """Fraction of a core one render keeps busy in Python, or None if unmeasured."""
+        with self._lock:
+            cost = self._costs.get((width, height))
+            if not cost or not cost['renders'] or cost['wall'] <= 0:
+                return None
+            return min(1.0, cost['cpu'] / cost['wall'])
+
+    def memory_mb(self, width, height):
+        with self._lock:
+            cost = self._costs.get((width, height))
+            return cost['memory_mb'] if cost else None
+
+
+render_costs = RenderCostTracker()
+
+
+def auto_tune_workers(width, height, total_rows):
+    """
+    Pick how many hooks to render at once from the host cores, the free
+    memory and the measured per-render cost for this output size.
+    """
+    cpus = available_cpus()
+
+    cpu_share = render_costs.cpu_share(width, height)
+    if cpu_share:
+        # Renders that mostly wait on ffmpeg can be overlapped beyond one per core.
+        cpu_workers = min(
+            cpus * MAX_CPU_OVERCOMMIT, math.ceil(cpus / max(cpu_share, 0.1))
+        )
+    else:
+        cpu_workers = cpus
+
+    per_render_mb = (
+        render_costs.memory_mb(width, height)
+        or estimate_render_memory_mb(width, height)
+    )
+    free_mb = available_memory_mb()
+    if free_mb is not None:
+        memory_workers = max(1, int(free_mb * MEMORY_HEADROOM / per_render_mb))
+    else:
+        memory_workers = cpu_workers
+
+    workers = max(1, min(cpu_workers, memory_workers, total_rows or 1))
+    logging.info(
+        f"Auto-tuned render workers: {workers} (cpus={cpus}, "
+        f"cpu_share={cpu_share}, per_render_mb={per_render_mb:.0f}, "
+        f"free_mb={free_mb})"
+    )
+    return workers
+
+
+def resolve_parallel_executions(hook, width, height, total_rows):
+    """
+    Return the number of hooks to render concurrently for a task.
+
+    An explicit value on the task wins, then the value on the user's plan,
+    and otherwise the worker count is auto-tuned for this host.
+    """
+    if not hook.parallel_processing:
+        return 1
+
+    configured = hook.concurrency
+    if not configured and hook.user and hook.user.subscription:
+        configured = hook.user.subscription.plan.hook_concurrency
+
+    if configured:
+        return max(1, min(int(configured), total_rows or 1))
+
+    return auto_tune_workers(width, height, total_rows)
@@ -0,0 +1,145 @@
+# Single-pass ffmpeg renderer for hook videos
+import logging
+import os
+import subprocess
+
+from django.conf import settings
+
+from hooks.models import Hook
+from utils.encoding import ffmpeg_video_args, get_encoding_profile
+from utils.probe import display_size, probe_media
+from .segment_cache import can_stream_copy, write_concat_list
+from .video_processors import build_overlay_layer
+
+logging.basicConfig(level=logging.DEBUG)
+
+def crop_scale_filter(width, height):
+    """Centre crop to the target aspect ratio and scale, like crop_to_aspect_ratio."""
+    aspect = f'{width}/{height}'
+    return (
+        f"crop='if(gt(iw/ih,{aspect}),trunc(ih*{aspect}/2)*2,iw)'"
+        f":'if(gt(iw/ih,{aspect}),ih,trunc(iw/({aspect})/2)*2)',"
+        f"scale={width}:{height},setsar=1"
+    )
+
+
+def build_ffmpeg_command(
+    video_files, segment_duration, audio_path, audio_duration, overlay_path,
+    width, height, fps, output_path, concat_list_path=None,
+    encoding_profile=None
+):
+    """
+    Compile one hook into a single ffmpeg invocation: trim, crop/scale and
+    concat the sources, overlay the flattened text/watermark layer and mux
+    the voiceover as is, like the moviepy path, all inside ffmpeg.
+
+    With `concat_list_path` (see write_concat_list) the background is read
+    from normalized segments through the concat demuxer instead, so only the
+    overlay pass decodes and encodes video.
+    """
+    command = ['ffmpeg', '-y', '-v', 'error']
+    filters = []
+    if concat_list_path:
+        command += ['-f', 'concat', '-safe', '0', '-i', concat_list_path]
+        filters.append('[0:v]setpts=PTS-STARTPTS[bg]')
+        audio_input = 1
+    else:
+        for video_file in video_files:
+            command += ['-t', f'{segment_duration:.3f}', '-i', video_file]
+        audio_input = len(video_files)
+
+        for i, video_file in enumerate(video_files):
+            # Normalized sources are already cropped and scaled to the output
+            # size; ffmpeg autorotates, so compare the size as displayed.
+            if display_size(probe_media(video_file)) == (width, height):
+                resize = ''
+            else:
+                resize = f"{crop_scale_filter(width, height)},"
+            filters.append(
+                f"[{i}:v]trim=duration={segment_duration:.3f},setpts=PTS-STARTPTS,"
+                f"{resize}fps={fps},format=yuv420p[v{i}]"
+            )
+        concat_inputs = ''.join(f'[v{i}]' for i in range(len(video_files)))
+        filters.append(f"{concat_inputs}concat=n={len(video_files)}:v=1:a=0[bg]")
+
+    overlay_input = audio_input + 1
+    command += ['-i', audio_path, '-loop', '1', '-i', overlay_path]
+
+    # The layer PNG has straight alpha, see OverlayLayer.save_png.
+    filters.append(
+        f"[bg][{overlay_input}:v]overlay=0:0:shortest=1[vout]"
+    )
+
+    command += [
+        '-filter_complex', ';'.join(filters),
+        '-map', '[vout]', '-map', f'{audio_input}:a',
+        '-t', f'{audio_duration:.3f}',
+        *ffmpeg_video_args(
+            encoding_profile or get_encoding_profile(settings.HOOK_ENCODING_PROFILE)
+        ),
+        '-pix_fmt', 'yuv420p',
+        '-c:a', 'aac',
+        output_path,
+    ]
+    return command
+
+
+def render_hook_ffmpeg(job, video_files, audio_duration, layout):
+    """Render one hook with a single ffmpeg process and return the output path."""
+    hook_number = job.idx + 1
+
+    video_files = [f for f in video_files if os.path.exists(f)]
+    if not video_files:
+        raise ValueError(
+            f"No valid video clips were found for hook {hook_number}"
+        )
+
+    segment_duration = audio_duration / len(video_files)
+    # moviepy writes at the highest frame rate among the concatenated clips.
+    fps = max(
+        (probe_media(f).fps or 0 for f in video_files), default=0
+    ) or 30
+
+    overlay_path = build_overlay_layer(layout, job.add_watermark).save_png(
+        os.path.join(job.output_videos_folder, f"overlay_{job.idx}.png")
+    )
+
+    # Uniformly encoded segments are joined by stream copy, not re-encoded.
+    concat_list_path = None
+    if can_stream_copy(video_files):
+        concat_list_path = write_concat_list(
+            video_files, segment_duration,
+            os.path.join(job.output_videos_folder, f"background_{job.idx}.ffconcat")
+        )
+
+    output_path = os.path.join(job.output_videos_folder, f'hook_{job.idx}.mp4')
+    command = build_ffmpeg_command(
+        video_files, segment_duration, job.audio_path, audio_duration,
+        overlay_path, job.width, job.height, fps, output_path, concat_list_path,
+        get_encoding_profile(job.encoding_profile or settings.HOOK_ENCODING_PROFILE)
+    )
+    logging.debug(f"ffmpeg render command: {' '.join(command)}")
+
+    try:
+        result = subprocess.run(
+            command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+        )
+        if result.returncode != 0:
+            raise RuntimeError(
+                f"ffmpeg failed for hook {hook_number}: {result.stderr.strip()}"
+            )
+    finally:
+        os.remove(overlay_path)
+        if concat_list_path:
+            os.remove(concat_list_path)
+
+    hook = Hook.objects.get(id=job.task_id)
+    try:
+        progress = int(hook.progress) + int(80 / job.total_rows)
+        if progress <= 100:
+            hook.track_progress(progress)
+    except (TypeError, ValueError):
+        pass
+
+    logging.info(f"ffmpeg render of hook {hook_number} completed")
+    return output_path
@@ -0,0 +1,59 @@
+# Fingerprints of a hook row's inputs, used to skip rows that are already rendered
+import hashlib
+import json
+from collections import defaultdict
+
+# Bump when a change to the rendering makes existing outputs stale.
+RENDER_VERSION = 1
+
+
+def sources_hash(source_hashes):
+    """One hash for the ordered content hashes of a task's source videos."""
+    return hashlib.sha256('\n'.join(source_hashes).encode('utf-8')).hexdigest()
+
+
+def row_fingerprint(hook_text, word_color_data, voice_id, source_hash, width, height,
+                    add_watermark, top_box_color, text_color, engine, encoding_profile,
+                    text_renderer, font_hash):
+    """
+    Hash everything that decides the output video of one row. The text
+    renderer and font go in like in overlay_cache_key, as both change pixels.
+    """
+    payload = json.dumps([
+        RENDER_VERSION, hook_text, word_color_data or [], voice_id, source_hash,
+        width, height, bool(add_watermark), list(top_box_color), list(text_color),
+        engine, encoding_profile, text_renderer, font_hash,
+    ], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ExistingOutputs:
+    """
+    The hook's stored video links by fingerprint, claimed row by row as a
+    re-run goes through the sheet. Rows with the same inputs each claim
+    their own link.
+    """
+
+    def __init__(self, hook):
+        self._by_fingerprint = defaultdict(list)
+        self._unusable = []
+        for link in hook.video_links.order_by('row_index', 'id'):
+            if link.fingerprint and link.video_file:
+                self._by_fingerprint[link.fingerprint].append(link)
+            else:
+                self._unusable.append(link)
+        self.kept = {}
+
+    def claim(self, idx, fingerprint):
+        """The link row `idx` can keep, or None if the row needs a render."""
+        links = self._by_fingerprint.get(fingerprint)
+        if not links:
+            return None
+        self.kept[idx] = links.pop(0)
+        return self.kept[idx]
+
+    def stale(self):
+        """The links no row claimed; call once every row has been seen."""
+        return self._unusable + [
+            link for links in self._by_fingerprint.values() for link in links
+        ]
@@ -1,27 +1,38 @@
 # Utility functions used to process fonts
+import hashlib
+import io
 import logging
 import tempfile
 import os
 import subprocess
+import threading
 
-logging.basicConfig(level=logging.basicConfig)
+from django.conf import settings
+from PIL import ImageFont
 
-def setup_fontconfig(font_path):
-    # Step 1: Create a temporary directory
-    temp_dir = tempfile.mkdtemp()
-    logging.info(f"Created temporary directory at {temp_dir}")
+logging.basicConfig(level=logging.DEBUG)
 
-    # Step 2: Prepare the Fontconfig configuration content
+FONT_FAMILY = 'Mu Font'
+FONT_PATH = os.path.abspath(
+    str(settings.BASE_DIR) + '/dependencies/fonts/mu.otf'
+)
+
+# Font sizes the four output dimensions start from, loaded up front.
+PRELOADED_FONT_SIZES = (33, 36, 38, 45, 60, 63)
+
+
+def write_fontconfig(font_path, config_dir):
+    """Write a fonts.conf that maps the 'Mu Font' family to `font_path`."""
     fontconfig_content = f"""<?xml version="1.0"?>
 <!DOCTYPE fontconfig SYSTEM "fonts.dtd">
 <fontconfig>
     <dir>{os.path.dirname(font_path)}</dir>
     <match target="pattern">
         <test name="family" qual="any">
-            <string>Mu Font</string>
+            <string>{FONT_FAMILY}</string>
         </test>
         <edit name="family" mode="assign" binding="strong">
-            <string>Mu Font</string>
+            <string>{FONT_FAMILY}</string>
         </edit>
         <edit name="file" mode="assign" binding="strong">
             <string>{font_path}</string>
@@ -29,27 +40,71 @@ def setup_fontconfig(font_path):
     </match>
 </fontconfig>
 """
-    logging.info("Fontconfig content prepared:")
-    logging.info(fontconfig_content)
-
-    # Step 3: Write the configuration to the temporary directory
-    config_path = os.path.join(temp_dir, "fonts.conf")
+    config_path = os.path.join(config_dir, "fonts.conf")
     with open(config_path, "w") as f:
         f.write(fontconfig_content.strip())  # Ensure no leading/trailing spaces or newlines
-    logging.info(f"Fontconfig written to {config_path}")
-
-    # Step 4: Set the FONTCONFIG_FILE environment variable
-    os.environ["FONTCONFIG_FILE"] = config_path
-    logging.info(f"FONTCONFIG_FILE environment variable set to {config_path}")
-
-    # Step 5: Verify the setup by listing the fonts recognized by Fontconfig
-    result = subprocess.run(['fc-list'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    logging.info("Fontconfig available fonts after setup:")
-    logging.info(result.stdout.decode())
-    
-    # Step 6: Check if any errors were reported
-    if result.stderr:
-        print("Debug: Fontconfig error:")
-        print(result.stderr.decode())
-
-    return temp_dir
\ No newline at end of file
+    return config_path
+
+
+class FontRegistry:
+    """
+    The hook font, set up once per process: fontconfig for the Pango
+    renderer and preloaded FreeType faces for metrics and the Pillow
+    renderer. Nothing about it changes after construction except the
+    face cache, which is guarded by a lock.
+    """
+
+    def __init__(self, font_path=FONT_PATH):
+        self.font_path = font_path
+        with open(font_path, 'rb') as f:
+            self.font_bytes = f.read()
+        self.font_hash = hashlib.sha256(self.font_bytes).hexdigest()
+
+        # Lives as long as the process; the env var must keep pointing at it.
+        self.config_dir = tempfile.mkdtemp(prefix='fontconfig-')
+        self.config_path = write_fontconfig(font_path, self.config_dir)
+
+        self._faces = {}
+        self._faces_lock = threading.Lock()
+        for size in PRELOADED_FONT_SIZES:
+            self.face(size)
+
+    def face(self, size):
+        """Return the FreeType face for `size` pixels, loading it only once."""
+        size = max(1, int(round(size)))
+        face = self._faces.get(size)
+        if face is None:
+            with self._faces_lock:
+                face = self._faces.get(size)
+                if face is None:
+                    face = ImageFont.truetype(io.BytesIO(self.font_bytes), size)
+                    self._faces[size] = face
+        return face
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_font_registry():
+    """Return the process-wide FontRegistry, creating it on first use."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                registry = FontRegistry()
+
+                # Set once, before any render thread reads it.
+                os.environ["FONTCONFIG_FILE"] = registry.config_path
+                result = subprocess.run(
+                    ['fc-list', FONT_FAMILY], stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE
+                )
+                if result.stderr:
+                    logging.error(f"Fontconfig error: {result.stderr.decode()}")
+                logging.info(
+                    f"Font registry ready with {registry.font_path} "
+                    f"(FONTCONFIG_FILE={registry.config_path})"
+                )
+                _registry = registry
+    return _registry
@@ -0,0 +1,322 @@
+# Pure layout of hook text overlays: boxes, lines, font sizes and positions
+import json
+import logging
+import math
+import re
+from collections import namedtuple
+from dataclasses import asdict, dataclass, field
+
+from .text_layout import (
+    break_first_line, fit_font_size, line_height, text_block_height, text_width
+)
+from .utils import split_hook_text
+
+logging.basicConfig(level=logging.DEBUG)
+
+# The parts of a sheet row the layout depends on: the hook text and the cells
+# of that row as lists of {'text', 'color'} words.
+LayoutRow = namedtuple('LayoutRow', ['hook_text', 'word_color_data'])
+
+
+def _color(value):
+    # JSON turns colour tuples into lists; named colours stay strings.
+    return tuple(value) if isinstance(value, list) else value
+
+
+@dataclass
+class HookStyle:
+    top_box_color: tuple
+    text_color: tuple
+    tiktok: bool = False
+
+
+@dataclass
+class Box:
+    """A filled rectangle, with rounded corners when `radius` is set."""
+    x: float
+    y: float
+    width: int
+    height: int
+    color: tuple
+    radius: int = 0
+    kind: str = 'box'
+
+
+@dataclass
+class TextBlock:
+    """
+    Coloured word runs drawn at `font_size`, centred in a `width` wide slot at
+    (x, y). With `wrap` the text wraps to that width, otherwise it is a single
+    line and `width` is its measured width.
+    """
+    runs: list
+    font_size: float
+    color: str
+    x: float
+    y: float
+    width: int
+    wrap: bool = False
+    kind: str = 'text'
+
+
+@dataclass
+class LayoutPlan:
+    """Everything drawn on a hook overlay, back to front."""
+    width: int
+    height: int
+    elements: list = field(default_factory=list)
+
+    def to_dict(self):
+        return asdict(self)
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), sort_keys=True)
+
+    @classmethod
+    def from_dict(cls, data):
+        elements = []
+        for element in data['elements']:
+            element = dict(element)
+            element['color'] = _color(element['color'])
+            if element['kind'] == 'box':
+                elements.append(Box(**element))
+            else:
+                element['runs'] = [
+                    (text, _color(color)) for text, color in element['runs']
+                ]
+                elements.append(TextBlock(**element))
+        return cls(data['width'], data['height'], elements)
+
+
+def _line_size(runs, font_size):
+    text = ''.join(text for text, _ in runs).strip()
+    return int(math.ceil(text_width(text, font_size))), line_height(font_size)
+
+
+def _line_elements(runs, font_size, color, y, frame_width, radius, hpadding,
+                   vpadding, box_color):
+    """A TikTok style line: a rounded box with the text centred inside."""
+    text_w, text_h = _line_size(runs, font_size)
+    box_w, box_h = text_w + hpadding, text_h + vpadding
+    box = Box((frame_width - box_w) / 2, y, box_w, box_h, box_color, radius)
+    text = TextBlock(
+        runs, font_size, color, (frame_width - text_w) / 2, y + (vpadding / 2),
+        text_w
+    )
+    return box, text
+
+
+def compute_hook_layout(row, dims, style):
+    """
+    Lay out the overlay for one sheet row on a `dims` (width, height) frame.
+
+    The first part of the hook goes in the top box and the part after ' - '
+    in the white box below it; in TikTok mode each part is instead split into
+    up to two lines on rounded boxes. Sizes come from the font metrics, so
+    the plan is the same for every text renderer.
+    """
+    OUT_VIDEO_WIDTH, OUT_VIDEO_HEIGHT = dims
+    word_color_data = row.word_color_data or []
+    is_tiktok = style.tiktok
+
+    orig_hook_text_parts = split_hook_text(row.hook_text.replace('_', ''))
+    hook_text = ' '.join(
+        [word['text'] for cell in word_color_data for word in cell]
+    )
+    hook_text_parts = split_hook_text(hook_text)
+
+    x_multiplier = OUT_VIDEO_WIDTH / 360
+    y_multiplier = OUT_VIDEO_HEIGHT / 450
+    min_red_area_h = int(round(40 * y_multiplier))
+
+    fontsize1 = int(round(15 * x_multiplier))
+    if is_tiktok:
+        fontsize1 += 18
+    if OUT_VIDEO_WIDTH == 1920 and OUT_VIDEO_HEIGHT == 1080:
+        fontsize1 -= 20
+
+    max_width = OUT_VIDEO_WIDTH - 100
+    x_margin = 5
+
+    if is_tiktok:
+        fit = fit_font_size(
+            hook_text_parts[0].strip(), fontsize1, min_red_area_h - 10, max_width
+        )
+        fontsize1, text_clip1_h = fit.size, fit.height
+        logging.info(
+            f"First part font size {fontsize1} fitted in {fit.measurements} measurements"
+        )
+    else:
+        text_clip1_h = text_block_height(
+            hook_text_parts[0].strip(), fontsize1, max_width
+        )
+        if text_clip1_h > (min_red_area_h - 10):
+            min_red_area_h = text_clip1_h + 10
+
+    first_line = hook_text_parts[0]
+    second_line = ''
+    if is_tiktok:
+        first_line, second_line = break_first_line(
+            hook_text_parts[0], fontsize1, max_width
+        )
+
+    # Colored word runs for the first part only
+    text_runs = []
+    first_line_runs = []
+    second_line_runs = []
+    word_index = 0
+    char_index = 0
+    words_in_first_part = hook_text_parts[0].split()
+    orig_hook_first_part_text = re.sub(r'\s+', ' ', orig_hook_text_parts[0])
+    for word_data in word_color_data:
+        for word_info in word_data:
+            word = word_info['text'].capitalize()
+            if word_index < len(words_in_first_part) and \
+                    word == words_in_first_part[word_index].capitalize():
+                color = word_info['color']
+                # Black in the sheet means "use the colour picked in the form"
+                if color == (0, 0, 0):
+                    color = style.text_color
+
+                run_text = word
+                char_index += len(word)
+                if char_index < len(orig_hook_first_part_text) and \
+                        orig_hook_first_part_text[char_index] == ' ':
+                    run_text += ' '
+                    char_index += 1
+
+                if word_index < len(first_line.split(' ')):
+                    first_line_runs.append((run_text, color))
+                else:
+                    second_line_runs.append((run_text, color))
+                text_runs.append((run_text, color))
+                word_index += 1
+
+    text_clip1_y_offset = (min_red_area_h - text_clip1_h) / 2
+    tiktok_elements = []
+    first_line_box = second_line_box = None
+
+    if is_tiktok:
+        padding_top = 570
+        text_clip1_y_offset += (padding_top / 2)
+        min_red_area_h += (padding_top / 2)
+
+        radius = 20
+        hpadding = 50
+        vpadding = 30
+
+        first_line_box, first_line_text = _line_elements(
+            first_line_runs, fontsize1, 'white', text_clip1_y_offset,
+            OUT_VIDEO_WIDTH, radius, hpadding, vpadding, style.top_box_color
+        )
+        if second_line != '':
+            second_line_box, second_line_text = _line_elements(
+                second_line_runs, fontsize1, 'white',
+                text_clip1_y_offset + first_line_box.height - radius - 1,
+                OUT_VIDEO_WIDTH, radius, hpadding, vpadding, style.top_box_color
+            )
+            tiktok_elements += [second_line_box, second_line_text]
+        tiktok_elements += [first_line_box, first_line_text]
+
+    top_box = Box(0, 0, OUT_VIDEO_WIDTH, min_red_area_h, style.top_box_color)
+    top_text = TextBlock(
+        text_runs, fontsize1, 'white', (OUT_VIDEO_WIDTH - max_width) / 2,
+        text_clip1_y_offset, max_width, wrap=True
+    )
+
+    if len(hook_text_parts) < 2:
+        if is_tiktok:
+            return LayoutPlan(OUT_VIDEO_WIDTH, OUT_VIDEO_HEIGHT, tiktok_elements)
+        return LayoutPlan(OUT_VIDEO_WIDTH, OUT_VIDEO_HEIGHT, [top_box, top_text])
+
+    # The second part, after the hyphen
+    min_white_area_h = int(round(30 * y_multiplier))
+    fontsize2 = int(round(15 * 0.6 * x_multiplier))
+    if is_tiktok:
+        fontsize2 += 18 * 0.6
+    elif OUT_VIDEO_WIDTH == 1920 and OUT_VIDEO_HEIGHT == 1080:
+        fontsize2 -= 20 * 0.6
+    else:
+        fontsize2 += 6
+    second_part_text = hook_text_parts[1]
+
+    text_clip2_h = text_block_height(
+        second_part_text.strip(), fontsize2, OUT_VIDEO_WIDTH - (x_margin * 2)
+    )
+    if is_tiktok:
+        # Only shrink when the text overflows at the full width, and then fit
+        # it into the narrower TikTok box.
+        if text_clip2_h > min_white_area_h:
+            fit = fit_font_size(
+                second_part_text.strip(), fontsize2, min_white_area_h,
+                max_width * 0.8
+            )
+            fontsize2, text_clip2_h = fit.size, fit.height
+            logging.info(
+                f"Second part font size {fontsize2} fitted in {fit.measurements + 1} measurements"
+            )
+    elif text_clip2_h > min_white_area_h:
+        min_white_area_h = text_clip2_h
+
+    first_line2 = second_part_text
+    second_line2 = ''
+    if is_tiktok:
+        first_line2, second_line2 = break_first_line(
+            second_part_text, fontsize2, max_width * 0.8
+        )
+
+    # Colored word runs for the second part, which is all in the last cell
+    text_runs2 = []
+    first_line_runs2 = []
+    second_line_runs2 = []
+    word_index_second = 0
+    words_in_second_part = second_part_text.split()
+    for word_info in (word_color_data[-1] if word_color_data else []):
+        word = word_info['text'].capitalize()
+        if word_index_second < len(words_in_second_part) and \
+                word == words_in_second_part[word_index_second].capitalize():
+            color = word_info['color']
+            # White words would vanish on the white box
+            if color == (255, 255, 255):
+                color = (0, 0, 0)
+
+            if word_index_second < len(first_line2.split(' ')):
+                first_line_runs2.append((word + ' ', color))
+            else:
+                second_line_runs2.append((word + ' ', color))
+            text_runs2.append((word + ' ', color))
+            word_index_second += 1
+
+    if not is_tiktok:
+        text_clip2_y_offset = min_red_area_h + (min_white_area_h - text_clip2_h) / 2
+        return LayoutPlan(OUT_VIDEO_WIDTH, OUT_VIDEO_HEIGHT, [
+            top_box,
+            Box(0, min_red_area_h, OUT_VIDEO_WIDTH, min_white_area_h, (255, 255, 255)),
+            top_text,
+            TextBlock(
+                text_runs2, fontsize2, 'black', x_margin, text_clip2_y_offset,
+                OUT_VIDEO_WIDTH - (x_margin * 2), wrap=True
+            ),
+        ])
+
+    radius2 = 15
+    hpadding2 = 40
+    vpadding2 = 20
+    second_part_margin = 20
+
+    first_part_end = text_clip1_y_offset + first_line_box.height + (
+        0 if second_line_box is None else second_line_box.height
+    )
+    first_line2_y = first_part_end + second_part_margin
+    first_line_box2, first_line_text2 = _line_elements(
+        first_line_runs2, fontsize2, 'black', first_line2_y, OUT_VIDEO_WIDTH,
+        radius2, hpadding2, vpadding2, (255, 255, 255)
+    )
+    if second_line2 != '':
+        tiktok_elements += _line_elements(
+            second_line_runs2, fontsize2, 'black',
+            first_line2_y + first_line_box2.height - radius2 - 1,
+            OUT_VIDEO_WIDTH, radius2, hpadding2, vpadding2, (255, 255, 255)
+        )
+    tiktok_elements += [first_line_box2, first_line_text2]
+    return LayoutPlan(OUT_VIDEO_WIDTH, OUT_VIDEO_HEIGHT, tiktok_elements)
@@ -0,0 +1,128 @@
+# Static overlay layer: the hook text (and watermark) flattened into one image
+import io
+import logging
+
+import numpy as np
+from PIL import Image
+
+logging.basicConfig(level=logging.DEBUG)
+
+def clip_to_rgba(clip):
+    """Rasterize frame 0 of a (static) clip and its mask into a straight-alpha RGBA array."""
+    rgb = clip.get_frame(0)
+    if clip.mask is not None:
+        alpha = clip.mask.get_frame(0) * 255
+    else:
+        alpha = np.full(rgb.shape[:2], 255)
+    return np.dstack([rgb, alpha]).clip(0, 255).astype('uint8')
+
+
+def composite_watermark(canvas, sprite):
+    """Alpha-composite a WatermarkSprite onto an RGBA PIL canvas."""
+    canvas.alpha_composite(sprite.image, sprite.position)
+    return canvas
+
+
+def alpha_box(alpha):
+    """Bounding box `(y1, y2, x1, x2)` of the non-transparent pixels."""
+    rows = np.flatnonzero(alpha.any(axis=1))
+    cols = np.flatnonzero(alpha.any(axis=0))
+    if not len(rows):
+        return (0, 0, 0, 0)
+    return (rows[0], rows[-1] + 1, cols[0], cols[-1] + 1)
+
+
+class OverlayLayer:
+    """
+    A static RGBA layer with premultiplied alpha, blended onto frames with a
+    single multiply-add restricted to the area the layer actually covers.
+    """
+
+    def __init__(self, rgba):
+        rgba = np.asarray(rgba, dtype='uint8')
+        self.size = (rgba.shape[1], rgba.shape[0])
+        self.box = alpha_box(rgba[:, :, 3])
+
+        y1, y2, x1, x2 = self.box
+        region = rgba[y1:y2, x1:x2].astype('uint16')
+        region_alpha = region[:, :, 3:4]
+        self.premultiplied = ((region[:, :, :3] * region_alpha + 127) // 255).astype('uint16')
+        self.inverse_alpha = 255 - region_alpha
+
+    @classmethod
+    def from_clip(cls, clip, watermark=None):
+        """Flatten a text overlay clip, plus an optional WatermarkSprite, once."""
+        rgba = clip_to_rgba(clip)
+        if watermark is not None:
+            canvas = composite_watermark(Image.fromarray(rgba, 'RGBA'), watermark)
+            rgba = np.array(canvas)
+        return cls(rgba)
+
+    @classmethod
+    def from_premultiplied(cls, rgba):
+        """Rebuild a layer from the image returned by `rgba()`."""
+        rgba = np.asarray(rgba, dtype='uint8')
+        layer = cls.__new__(cls)
+        layer.size = (rgba.shape[1], rgba.shape[0])
+        layer.box = alpha_box(rgba[:, :, 3])
+
+        y1, y2, x1, x2 = layer.box
+        region = rgba[y1:y2, x1:x2].astype('uint16')
+        layer.premultiplied = region[:, :, :3]
+        layer.inverse_alpha = 255 - region[:, :, 3:4]
+        return layer
+
+    @classmethod
+    def from_png_bytes(cls, data):
+        """Load a layer written by `png_bytes()`."""
+        return cls.from_premultiplied(np.array(Image.open(io.BytesIO(data)).convert('RGBA')))
+
+    @property
+    def nbytes(self):
+        return self.premultiplied.nbytes + self.inverse_alpha.nbytes
+
+    def png_bytes(self):
+        """Encode the premultiplied layer as PNG, for caching or ffmpeg."""
+        buffer = io.BytesIO()
+        Image.fromarray(self.rgba(), 'RGBA').save(buffer, format='PNG')
+        return buffer.getvalue()
+
+    def rgba(self):
+        """Return the full-size premultiplied RGBA image."""
+        width, height = self.size
+        image = np.zeros((height, width, 4), dtype='uint8')
+        y1, y2, x1, x2 = self.box
+        image[y1:y2, x1:x2, :3] = self.premultiplied
+        image[y1:y2, x1:x2, 3:4] = 255 - self.inverse_alpha
+        return image
+
+    def straight_rgba(self):
+        """
+        Return the full-size image with straight (unpremultiplied) alpha.
+        ffmpeg converts overlay inputs to YUVA before blending, where a
+        premultiplied transparent pixel would still carry black's luma.
+        """
+        image = self.rgba()
+        alpha = image[:, :, 3:4].astype('uint16')
+        rgb = image[:, :, :3].astype('uint16')
+        straight = np.where(
+            alpha > 0, (rgb * 255 + alpha // 2) // np.maximum(alpha, 1), 0
+        )
+        image[:, :, :3] = np.minimum(straight, 255).astype('uint8')
+        return image
+
+    def save_png(self, path):
+        """Write the layer as a straight-alpha PNG for ffmpeg's overlay filter."""
+        Image.fromarray(self.straight_rgba(), 'RGBA').save(path, format='PNG')
+        return path
+
+    def apply(self, frame):
+        """Blend the layer onto an RGB frame of the same size."""
+        y1, y2, x1, x2 = self.box
+        if y1 == y2:
+            return frame
+        frame = np.array(frame, dtype='uint8')
+        region = frame[y1:y2, x1:x2].astype('uint16')
+        blended = (region * self.inverse_alpha + 127) // 255 + self.premultiplied
+        frame[y1:y2, x1:x2] = np.minimum(blended, 255).astype('uint8')
+        return frame
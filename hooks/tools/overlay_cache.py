@@ -0,0 +1,81 @@
+# Content-addressed cache of rendered hook text overlays
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+
+from utils.blob_cache import BlobCache, LRUCache
+from .overlay import OverlayLayer
+
+logging.basicConfig(level=logging.DEBUG)
+
+# Bump when the overlay drawing code changes in a way that alters the pixels,
+# so entries rendered by older workers are no longer picked up.
+OVERLAY_CACHE_VERSION = 2
+
+
+def overlay_cache_key(plan, add_watermark, renderer_name, font_hash):
+    """Hash everything that decides the pixels of a hook's overlay layer."""
+    payload = json.dumps([
+        OVERLAY_CACHE_VERSION, plan.to_dict(), bool(add_watermark),
+        renderer_name, font_hash,
+    ], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class OverlayCache:
+    """
+    Overlay layers by content hash. Decoded layers are kept in memory for the
+    current process; their PNGs go to the shared blob cache (local disk and,
+    if enabled, S3), so repeated hooks across tasks skip the text render.
+    """
+
+    def __init__(self, memory_bytes, disk_bytes, s3_prefix=None):
+        self.memory = LRUCache(memory_bytes, sizeof=lambda layer: layer.nbytes)
+        self.blobs = BlobCache('overlays', disk_bytes, s3_prefix=s3_prefix)
+
+    def get(self, key):
+        layer = self.memory.get(key)
+        if layer is not None:
+            return layer
+
+        data = self.blobs.get(key)
+        if data is None:
+            return None
+        try:
+            layer = OverlayLayer.from_png_bytes(data)
+        except Exception as err:
+            logging.error(f"Discarding unreadable overlay cache entry {key}: {err}")
+            return None
+        self.memory.set(key, layer)
+        return layer
+
+    def set(self, key, layer):
+        self.memory.set(key, layer)
+        self.blobs.set(key, layer.png_bytes())
+
+    def get_or_render(self, key, render):
+        """Return the cached layer for `key`, calling `render()` on a miss."""
+        layer = self.get(key)
+        if layer is not None:
+            logging.info(f"Overlay cache hit {key[:12]}")
+            return layer
+        layer = render()
+        self.set(key, layer)
+        return layer
+
+
+_overlay_cache = None
+
+
+def get_overlay_cache():
+    """Return the process-wide overlay cache configured from settings."""
+    global _overlay_cache
+    if _overlay_cache is None:
+        _overlay_cache = OverlayCache(
+            settings.HOOK_OVERLAY_CACHE_MEMORY_MB * 1024 * 1024,
+            settings.HOOK_OVERLAY_CACHE_DISK_MB * 1024 * 1024,
+            s3_prefix='cache/overlays' if settings.HOOK_OVERLAY_CACHE_S3 else None,
+        )
+    return _overlay_cache
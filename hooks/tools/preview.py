@@ -0,0 +1,94 @@
+# Single-frame previews of hook overlays, without TTS or a video encode
+import io
+import logging
+import subprocess
+
+import numpy as np
+from django.conf import settings
+from PIL import Image
+
+from utils.blob_cache import LRUCache
+from .ffmpeg_renderer import crop_scale_filter
+from .layout import HookStyle, LayoutRow, compute_hook_layout
+from .rows import HookRow
+from .sheet_cache import get_sheet_snapshot
+from .utils import OUTPUT_DIMENSIONS, hex_to_rgb
+from .video_processors import build_overlay_layer
+
+logging.basicConfig(level=logging.DEBUG)
+
+# Cropped and scaled first frames of uploaded videos, by (video, size).
+_frames = LRUCache(
+    settings.HOOK_PREVIEW_FRAME_CACHE_MB * 1024 * 1024,
+    sizeof=lambda frame: frame.nbytes
+)
+
+
+def grab_frame(source, width, height):
+    """
+    Decode the first frame of `source` (a path or URL), cropped and scaled to
+    `width` x `height` like the render, as an RGB array. Every hook starts on
+    the first frame of its first clip, so that is what the preview shows.
+    """
+    command = [
+        'ffmpeg', '-v', 'error', '-i', source, '-frames:v', '1',
+        '-vf', crop_scale_filter(width, height),
+        '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-',
+    ]
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0 or len(result.stdout) < width * height * 3:
+        raise RuntimeError(
+            f"Could not read a frame from the hook video: {result.stderr.decode().strip()}"
+        )
+    frame = np.frombuffer(result.stdout[:width * height * 3], dtype='uint8')
+    return frame.reshape((height, width, 3))
+
+
+def get_first_frame(video_file, width, height):
+    """Cached grab_frame for a FileField of an uploaded video."""
+    key = (video_file.name, width, height)
+    frame = _frames.get(key)
+    if frame is None:
+        frame = grab_frame(video_file.url, width, height)
+        frame.setflags(write=False)
+        _frames.set(key, frame)
+    return frame
+
+
+def render_preview_png(hook, row_index, aspect_ratio):
+    """
+    Render row `row_index` of the hook's sheet over the first frame of its
+    video at `aspect_ratio` and return PNG bytes. Uses the same layout and
+    overlay cache as the real render. Raises IndexError for a missing row or
+    one the render would skip, like a row without hook text in column A.
+    """
+    width, height = OUTPUT_DIMENSIONS[aspect_ratio]
+    sheet = get_sheet_snapshot(hook.google_sheets_link)
+    row = None
+    if 0 <= row_index < len(sheet.values):
+        row = HookRow.from_sheet_row(
+            row_index, sheet.values[row_index], sheet.row_word_colors(row_index)
+        )
+    if row is None:
+        raise IndexError(f"Row {row_index} is not in the sheet")
+
+    plan = compute_hook_layout(
+        LayoutRow(row.text, row.word_runs),
+        (width, height),
+        HookStyle(
+            hex_to_rgb(hook.box_color), hex_to_rgb(hook.font_color),
+            aspect_ratio == 'option3'
+        )
+    )
+
+    try:
+        add_watermark = hook.user.subscription.plan.name.lower() == 'free'
+    except Exception:
+        add_watermark = True
+
+    overlay_layer = build_overlay_layer(plan, add_watermark)
+    frame = overlay_layer.apply(get_first_frame(hook.hooks_content, width, height))
+
+    buffer = io.BytesIO()
+    Image.fromarray(frame, 'RGB').save(buffer, format='PNG', compress_level=1)
+    return buffer.getvalue()
@@ -0,0 +1,137 @@
+# Picklable render job descriptors shared by the thread and process backends
+import logging
+import os
+import time
+from collections import namedtuple
+
+from .concurrency import peak_memory_mb
+
+logging.basicConfig(level=logging.DEBUG)
+
+# Everything a worker needs to render one hook. Only plain values travel to
+# the worker: no pandas rows, no open clips, no model instances.
+RenderJob = namedtuple('RenderJob', [
+    'idx',
+    'hook_text',
+    'audio_path',
+    'source_videos',
+    'width',
+    'height',
+    'output_videos_folder',
+    'total_rows',
+    'task_id',
+    'top_box_color',
+    'default_text_color',
+    'word_color_data',
+    'add_watermark',
+    'is_tiktok',
+    'engine',
+    'layout',
+    'encoding_profile',
+])
+
+# What a worker sends back: the output path and what the render cost, for
+# the parent to record in render_costs (a process worker has its own copy).
+# `memory_mb` is the peak of a worker process, None for thread workers.
+RenderOutput = namedtuple(
+    'RenderOutput', ['path', 'wall_seconds', 'cpu_seconds', 'memory_mb']
+)
+
+# Set in render worker processes, which only ever run one render at a time
+_worker_process = False
+
+
+def job_layout(job):
+    """The job's LayoutPlan, planned up front or computed here as a fallback."""
+    from .layout import HookStyle, LayoutPlan, LayoutRow, compute_hook_layout
+
+    if job.layout is not None:
+        return LayoutPlan.from_dict(job.layout)
+    return compute_hook_layout(
+        LayoutRow(job.hook_text, job.word_color_data), (job.width, job.height),
+        HookStyle(job.top_box_color, job.default_text_color, job.is_tiktok)
+    )
+
+
+def select_source_videos(job, audio_duration):
+    """Pick the consecutive source videos that cover the audio of this row."""
+    video_index = job.idx % len(job.source_videos)
+    num_videos_to_use = int(round(audio_duration / 2))
+
+    video_file_size = len(job.source_videos)
+    if num_videos_to_use + video_index > video_file_size:
+        num_videos_to_use = video_file_size - video_index
+
+    return list(job.source_videos[video_index:video_index + num_videos_to_use])
+
+
+def render_job(job):
+    """Render a single hook video and return its RenderOutput."""
+    started = time.perf_counter()
+    cpu_started = time.thread_time()
+    path = _render(job)
+    return RenderOutput(
+        path, time.perf_counter() - started, time.thread_time() - cpu_started,
+        peak_memory_mb() if _worker_process else None
+    )
+
+
+def _render(job):
+    from utils.probe import probe_media
+    from .segment_cache import normalized_source
+
+    # Picking the source videos only needs the probed duration, no decoder.
+    audio_duration = probe_media(job.audio_path).duration
+    video_files_to_use = select_source_videos(job, audio_duration)
+
+    # Assemble the background from sources already cropped to the output size.
+    segment_duration = audio_duration / max(1, len(video_files_to_use))
+    video_files_to_use = [
+        normalized_source(f, job.width, job.height, segment_duration)
+        for f in video_files_to_use
+    ]
+
+    if job.engine == 'ffmpeg':
+        from .ffmpeg_renderer import render_hook_ffmpeg
+
+        return render_hook_ffmpeg(
+            job, video_files_to_use, audio_duration, job_layout(job)
+        )
+
+    from moviepy.editor import AudioFileClip
+    from .video_processors import process_audio_on_videos
+
+    audio_clip = AudioFileClip(job.audio_path)
+
+    return process_audio_on_videos(
+        video_files_to_use, job.idx, job.idx + 1, job.hook_text,
+        len(video_files_to_use), audio_clip, job.width, job.height,
+        job.output_videos_folder, job.total_rows, job.task_id,
+        job.top_box_color, job.default_text_color, job.word_color_data, None,
+        job.add_watermark, job.is_tiktok, job_layout(job), job.encoding_profile
+    )
+
+
+def init_render_worker():
+    """
+    Prepare a render worker process once: Django, fonts and the watermark
+    sprites, so each job only pays for its own render.
+    """
+    import django
+
+    global _worker_process
+    _worker_process = True
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hooks_app.settings')
+    django.setup()
+
+    from django.db import connections
+    from .font_utils import get_font_registry
+    from .sprites import prewarm_sprites
+
+    # Never reuse database connections inherited from the parent.
+    connections.close_all()
+
+    get_font_registry()
+    prewarm_sprites()
+    logging.info(f"Render worker {os.getpid()} initialized")
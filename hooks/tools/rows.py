@@ -0,0 +1,45 @@
+# Compact records of the sheet rows that go through a hook task
+
+
+class HookRow:
+    """
+    One sheet row on its way through the pipeline. Built once from the sheet
+    snapshot; each later field is written by a single stage (TTS, then
+    render) before the next stage reads it, so rows are shared between
+    stages without locking.
+    """
+
+    __slots__ = (
+        'idx',          # 0-based row of the sheet
+        'text',         # hook text as written in the sheet
+        'word_runs',    # coloured words of each cell, see spreadsheet_extractor
+        'fingerprint',  # hash of the row's inputs, see fingerprint.row_fingerprint
+        'layout',       # LayoutPlan of the overlay
+        'audio_path',
+        'source_plan',  # the task's source videos, see render_jobs.select_source_videos
+        'output_path',
+    )
+
+    def __init__(self, idx, text, word_runs, source_plan=()):
+        self.idx = idx
+        self.text = text
+        self.word_runs = word_runs
+        self.fingerprint = None
+        self.layout = None
+        self.audio_path = None
+        self.source_plan = source_plan
+        self.output_path = None
+
+    @classmethod
+    def from_sheet_row(cls, idx, values, word_runs, source_plan=()):
+        """
+        The HookRow of a sheet row, or None for a row without hook text.
+        Only column A is a hook; other columns are neither voiced nor drawn.
+        """
+        text = values[0] if values else ''
+        if not text.strip():
+            return None
+        return cls(idx, text, tuple(word_runs[:1]), source_plan)
+
+    def __repr__(self):
+        return f"HookRow({self.idx}, {self.text!r})"
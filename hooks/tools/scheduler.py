@@ -0,0 +1,142 @@
+# Rolling work-queue scheduler used to render hooks concurrently
+import logging
+import multiprocessing
+import time
+from collections import namedtuple
+from concurrent.futures import (
+    ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+)
+
+from .render_jobs import init_render_worker
+
+logging.basicConfig(level=logging.DEBUG)
+
+# Execution backends: threads share the interpreter (and the GIL), processes
+# each get their own interpreter initialized once by `init_render_worker`.
+THREAD_BACKEND = 'thread'
+PROCESS_BACKEND = 'process'
+
+# Outcome of a single row: `output` is whatever the render returned and
+# `error` the exception it raised, if any.
+RowResult = namedtuple('RowResult', ['idx', 'output', 'error', 'elapsed'])
+
+
+def stream_stage(items, work, max_workers, should_cancel=None, name='stage'):
+    """
+    Run `work(*args)` for every `(idx, args)` of `items` on up to
+    `max_workers` threads and yield a `RowResult` as each row finishes, in
+    completion order, so the next stage can start on a row while this one
+    is still busy with the others. Failed rows are yielded with their error
+    for the caller to report.
+    """
+    should_cancel = should_cancel or (lambda: False)
+    items = iter(items)
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, int(max_workers)), thread_name_prefix=f'hook-{name}'
+    ) as executor:
+        in_flight = {}
+
+        def submit_next():
+            for idx, args in items:
+                in_flight[executor.submit(work, *args)] = (idx, time.perf_counter())
+                return True
+            return False
+
+        while len(in_flight) < max_workers and submit_next():
+            pass
+
+        while in_flight:
+            if should_cancel():
+                for future in in_flight:
+                    future.cancel()
+                return
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                idx, submitted = in_flight.pop(future)
+                elapsed = time.perf_counter() - submitted
+                submit_next()
+                try:
+                    result = RowResult(idx, future.result(), None, elapsed)
+                except Exception as err:
+                    logging.error(f"Row {idx} failed in the {name} stage --> {err}")
+                    result = RowResult(idx, None, err, elapsed)
+                yield result
+
+
+class RenderScheduler:
+    """
+    Keeps exactly `max_workers` renders in flight and starts the next row as
+    soon as any of them finishes, instead of running fixed batches that wait
+    for their slowest member.
+    """
+
+    def __init__(self, max_workers, should_cancel=None, backend=THREAD_BACKEND):
+        if backend not in (THREAD_BACKEND, PROCESS_BACKEND):
+            raise ValueError(f"Unsupported render backend: {backend}")
+        self.max_workers = max(1, int(max_workers))
+        self.should_cancel = should_cancel or (lambda: False)
+        self.backend = backend
+        self.cancelled = False
+
+    def _executor(self):
+        if self.backend == PROCESS_BACKEND:
+            # spawn, not fork: the parent holds threads and DB connections.
+            return ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_render_worker,
+            )
+        return ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix='hook-render'
+        )
+
+    def run(self, jobs, render):
+        """
+        Render every `(idx, args)` pair from `jobs` with `render(*args)`.
+        With the process backend `render` and `args` must be picklable.
+
+        Returns the `RowResult`s ordered by row index. Failures are collected
+        per row rather than raised, so one bad row does not stop the others.
+        """
+        results = {}
+        started = time.perf_counter()
+
+        with self._executor() as executor:
+            in_flight = {}
+
+            def collect(done):
+                for future in done:
+                    idx, submitted = in_flight.pop(future)
+                    elapsed = time.perf_counter() - submitted
+                    try:
+                        results[idx] = RowResult(idx, future.result(), None, elapsed)
+                        logging.info(f"Row {idx} rendered in {elapsed:.1f}s")
+                    except Exception as err:
+                        results[idx] = RowResult(idx, None, err, elapsed)
+                        logging.error(f"Row {idx} failed after {elapsed:.1f}s --> {err}")
+
+            for idx, args in jobs:
+                if self.should_cancel():
+                    self.cancelled = True
+                    break
+
+                while len(in_flight) >= self.max_workers:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done)
+
+                future = executor.submit(render, *args)
+                in_flight[future] = (idx, time.perf_counter())
+
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+
+        total = time.perf_counter() - started
+        if results and total > 0:
+            logging.info(
+                f"Rendered {len(results)} rows in {total:.1f}s "
+                f"({len(results) * 60 / total:.1f} rows/min, {self.max_workers} "
+                f"{self.backend} workers)"
+            )
+        return [results[idx] for idx in sorted(results)]
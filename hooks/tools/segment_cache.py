@@ -0,0 +1,171 @@
+# Source videos cropped, scaled and re-encoded once per output size
+import hashlib
+import logging
+import math
+import os
+import subprocess
+import tempfile
+import threading
+
+from django.conf import settings
+
+from utils.blob_cache import BlobCache
+from utils.probe import file_content_hash, probe_media
+
+logging.basicConfig(level=logging.DEBUG)
+
+# Bump when the normalization command changes.
+SEGMENT_CACHE_VERSION = 3
+
+_blobs = None
+_key_locks = {}
+_key_locks_lock = threading.Lock()
+
+
+def _get_blobs():
+    global _blobs
+    if _blobs is None:
+        _blobs = BlobCache(
+            'segments', settings.HOOK_SEGMENT_CACHE_DISK_MB * 1024 * 1024
+        )
+    return _blobs
+
+
+def _key_lock(key):
+    with _key_locks_lock:
+        return _key_locks.setdefault(key, threading.Lock())
+
+
+def segment_cache_key(source_hash, width, height, fps, duration):
+    return hashlib.sha256(
+        f"{SEGMENT_CACHE_VERSION}:{source_hash}:{width}x{height}@{fps:.3f}"
+        f":{duration:.3f}".encode('utf-8')
+    ).hexdigest()
+
+
+def build_normalize_command(source, width, height, fps, duration, output_path):
+    """
+    ffmpeg command that crops and scales the first `duration` seconds of
+    `source` like crop_to_aspect_ratio, at a constant `fps`. Without
+    B-frames every segment can be cut short by stream copy, see
+    assemble_background.
+    """
+    from .ffmpeg_renderer import crop_scale_filter
+
+    return [
+        'ffmpeg', '-y', '-v', 'error',
+        '-t', f'{duration:.3f}', '-i', source,
+        '-vf', f"{crop_scale_filter(width, height)},fps={fps:.3f},format=yuv420p",
+        '-an',
+        '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '18',
+        '-g', str(max(1, int(round(fps)))), '-bf', '0', '-pix_fmt', 'yuv420p',
+        '-movflags', '+faststart',
+        '-f', 'mp4', output_path,
+    ]
+
+
+def normalized_source(source, width, height, needed_duration):
+    """
+    Path of `source` cropped and scaled to `width` x `height`, encoded once
+    per (source content, size, fps) and shared by every row that uses it.
+    Only the first `needed_duration` seconds, rounded up to a multiple of
+    HOOK_SEGMENT_PREFIX_SECONDS, are encoded, so the first row to use a
+    source waits for a short encode rather than the whole video. Falls back
+    to `source` itself when normalizing is disabled, fails, or the row needs
+    more than HOOK_SEGMENT_MAX_SECONDS of it.
+    """
+    if not settings.HOOK_NORMALIZED_SEGMENTS or not os.path.exists(source):
+        return source
+
+    media_info = probe_media(source)
+    if not media_info.has_video:
+        return source
+    duration = min(media_info.duration, settings.HOOK_SEGMENT_MAX_SECONDS)
+    if needed_duration > duration + 0.01:
+        return source
+    fps = media_info.fps or 30
+    step = settings.HOOK_SEGMENT_PREFIX_SECONDS
+    duration = min(duration, step * max(1, math.ceil(needed_duration / step)))
+
+    key = segment_cache_key(file_content_hash(source), width, height, fps, duration)
+    blobs = _get_blobs()
+    with _key_lock(key):
+        path = blobs.local_path(key)
+        if path is not None:
+            return path
+
+        fd, temp_path = tempfile.mkstemp(suffix='.mp4', dir=blobs.directory)
+        os.close(fd)
+        command = build_normalize_command(
+            source, width, height, fps, duration, temp_path
+        )
+        result = subprocess.run(
+            command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+        )
+        if result.returncode != 0:
+            os.remove(temp_path)
+            logging.error(
+                f"Normalizing {source} to {width}x{height} failed, using it as is: "
+                f"{result.stderr.strip()}"
+            )
+            return source
+
+        logging.info(f"Normalized {os.path.basename(source)} to {width}x{height}@{fps:.3f}")
+        return blobs.set_file(key, temp_path)
+
+
+def is_normalized(path):
+    """Whether `path` is an intermediate from the segment cache."""
+    return os.path.dirname(os.path.dirname(os.path.abspath(path))) == \
+        os.path.abspath(_get_blobs().directory)
+
+
+def can_stream_copy(segments):
+    """Segments can be joined without re-encoding if they share their encoding."""
+    if not segments or not all(
+        os.path.exists(s) and is_normalized(s) for s in segments
+    ):
+        return False
+    formats = {
+        (info.width, info.height, round(info.fps or 0, 3))
+        for info in (probe_media(s) for s in segments)
+    }
+    return len(formats) == 1
+
+
+def write_concat_list(segments, segment_duration, list_path):
+    """Write an ffconcat file playing the first `segment_duration` seconds of each segment."""
+    with open(list_path, 'w') as f:
+        f.write('ffconcat version 1.0\n')
+        for segment in segments:
+            escaped = segment.replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+            f.write(f"outpoint {segment_duration:.3f}\n")
+    return list_path
+
+
+def assemble_background(segments, segment_duration, output_path):
+    """
+    Join the first `segment_duration` seconds of each normalized segment into
+    one background video with the concat demuxer, copying the packets instead
+    of decoding and re-encoding them.
+    """
+    list_path = write_concat_list(
+        segments, segment_duration, output_path + '.ffconcat'
+    )
+    command = [
+        'ffmpeg', '-y', '-v', 'error',
+        '-f', 'concat', '-safe', '0', '-i', list_path,
+        '-c', 'copy', '-an', '-f', 'mp4', output_path,
+    ]
+    try:
+        result = subprocess.run(
+            command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+        )
+    finally:
+        os.remove(list_path)
+    if result.returncode != 0:
+        raise RuntimeError(
+            f"Stream copy of the background failed: {result.stderr.strip()}"
+        )
+    return output_path
@@ -0,0 +1,199 @@
+# Short-lived cache of Google Sheet snapshots, shared by the web app and workers
+import hashlib
+import json
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+
+from utils.blob_cache import BlobCache, LRUCache
+from .spreadsheet_extractor import (
+    SheetSnapshot, extract_spreadsheet_id, fetch_sheet_modified_time,
+    fetch_sheet_snapshot, iter_sheet_pages
+)
+
+logging.basicConfig(level=logging.DEBUG)
+
+# Bump when SheetSnapshot or the way it is parsed changes.
+SHEET_CACHE_VERSION = 1
+
+_memory = LRUCache(256, sizeof=lambda entry: 1)
+_blobs = None
+_key_locks = {}
+_key_locks_lock = threading.Lock()
+
+
+def _get_blobs():
+    global _blobs
+    if _blobs is None:
+        _blobs = BlobCache(
+            'sheets', 64 * 1024 * 1024,
+            s3_prefix='cache/sheets' if settings.HOOK_SHEET_CACHE_S3 else None,
+        )
+    return _blobs
+
+
+def _key_lock(key):
+    with _key_locks_lock:
+        return _key_locks.setdefault(key, threading.Lock())
+
+
+def sheet_cache_key(spreadsheet_id):
+    return hashlib.sha256(
+        f"{SHEET_CACHE_VERSION}:{spreadsheet_id}".encode('utf-8')
+    ).hexdigest()
+
+
+def _load(key):
+    entry = _memory.get(key)
+    if entry is not None:
+        return entry
+
+    data = _get_blobs().get(key)
+    if data is None:
+        return None
+    try:
+        payload = json.loads(data)
+        entry = (payload['fetched_at'], SheetSnapshot.from_dict(payload['snapshot']))
+    except (KeyError, TypeError, ValueError) as err:
+        logging.error(f"Ignoring unreadable sheet cache entry {key[:12]}: {err}")
+        return None
+    _memory.set(key, entry)
+    return entry
+
+
+def _store(key, fetched_at, snapshot):
+    entry = (fetched_at, snapshot)
+    _memory.set(key, entry)
+    _get_blobs().set(key, json.dumps({
+        'fetched_at': fetched_at,
+        'snapshot': snapshot.to_dict(),
+    }).encode('utf-8'))
+    return entry
+
+
+def _fresh_snapshot(key, spreadsheet_id):
+    """The cached snapshot if it is within its TTL or the sheet is unchanged."""
+    entry = _load(key)
+    if entry is None:
+        return None
+    fetched_at, snapshot = entry
+    if time.time() - fetched_at < settings.HOOK_SHEET_CACHE_TTL:
+        return snapshot
+    if snapshot.modified_time and \
+            fetch_sheet_modified_time(spreadsheet_id) == snapshot.modified_time:
+        logging.info(f"Sheet {spreadsheet_id} is unchanged, reusing the snapshot")
+        return _store(key, time.time(), snapshot)[1]
+    return None
+
+
+def get_sheet_snapshot(google_sheet_link):
+    """
+    SheetSnapshot of the sheet, reused for HOOK_SHEET_CACHE_TTL seconds.
+    Older snapshots are kept if Drive reports the same modifiedTime, so only
+    a sheet that was edited is fetched again. Concurrent callers for one
+    sheet share a single fetch.
+    """
+    spreadsheet_id = extract_spreadsheet_id(google_sheet_link)
+    key = sheet_cache_key(spreadsheet_id)
+
+    with _key_lock(key):
+        snapshot = _fresh_snapshot(key, spreadsheet_id)
+        if snapshot is None:
+            snapshot = fetch_sheet_snapshot(google_sheet_link)
+            _store(key, time.time(), snapshot)
+        return snapshot
+
+
+class SheetRowStream:
+    """
+    The rows of a sheet as `(idx, values, word_colors)`, in order. A cached
+    snapshot is replayed as is; otherwise the sheet is fetched in pages of
+    `page_size` rows on a background thread, one page ahead of the reader,
+    and cached once the last page is in. The first page is fetched right
+    away so an unreadable sheet fails before any work starts.
+    """
+
+    def __init__(self, google_sheet_link, page_size):
+        self.google_sheet_link = google_sheet_link
+        self.page_size = page_size
+        self.spreadsheet_id = extract_spreadsheet_id(google_sheet_link)
+        self._key = sheet_cache_key(self.spreadsheet_id)
+        self._rows_seen = 0
+        # Exact row count, known once the last page of the grid is in
+        self._total = None
+
+        self.snapshot = _fresh_snapshot(self._key, self.spreadsheet_id)
+        if self.snapshot is not None:
+            return
+
+        self._pages = queue.Queue(maxsize=1)
+        pages = iter_sheet_pages(google_sheet_link, page_size)
+        self._first_page = next(pages)
+        self._note_page(*self._first_page)
+        self._thread = threading.Thread(
+            target=self._fetch_rest, args=(pages,), name='hook-sheet-pages',
+            daemon=True
+        )
+        self._thread.start()
+
+    def _fetch_rest(self, pages):
+        try:
+            for page in pages:
+                self._pages.put(page)
+        except Exception as err:
+            self._pages.put(err)
+        self._pages.put(None)
+
+    def _note_page(self, first_row, page):
+        if page.grid_rows is not None and first_row + self.page_size >= page.grid_rows:
+            # Rows before this page are all yielded by the time it is noted
+            self._total = first_row + len(page.values) if page.values \
+                else self._rows_seen
+
+    def _iter_pages(self):
+        yield self._first_page
+        while True:
+            page = self._pages.get()
+            if page is None:
+                return
+            if isinstance(page, Exception):
+                raise page
+            self._note_page(*page)
+            yield page
+
+    def total_estimate(self):
+        """Number of rows, exact once the last page is in, else the rows so far plus a page."""
+        if self.snapshot is not None:
+            return len(self.snapshot.values)
+        if self._total is not None:
+            return self._total
+        return self._rows_seen + self.page_size
+
+    def __iter__(self):
+        if self.snapshot is not None:
+            for idx, values in enumerate(self.snapshot.values):
+                yield idx, values, self.snapshot.row_word_colors(idx)
+            return
+
+        values = []
+        word_colors = []
+        for first_row, page in self._iter_pages():
+            # Rows a page left out at its end (or a blank page) are empty
+            padding = first_row - len(values)
+            values += [()] * padding
+            word_colors += [()] * padding
+            for offset, row_values in enumerate(page.values):
+                idx = first_row + offset
+                values.append(row_values)
+                word_colors.append(page.row_word_colors(offset))
+                self._rows_seen = idx + 1
+                yield idx, row_values, page.row_word_colors(offset)
+
+        self.snapshot = SheetSnapshot(
+            self.spreadsheet_id, tuple(values), tuple(word_colors),
+            self._first_page[1].modified_time
+        )
+        _store(self._key, time.time(), self.snapshot)
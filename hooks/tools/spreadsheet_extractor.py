@@ -1,6 +1,7 @@
 import re
 import requests
 import logging
+from dataclasses import dataclass
 from django.conf import settings
 
 # setup logging
@@ -23,30 +24,94 @@ def extract_spreadsheet_id(google_sheet_link):
     logger.error("Invalid Google Sheets URL")
     raise ValueError("Invalid Google Sheets URL")
 
-# Fetch Basic Google Sheet Data
-def fetch_google_sheet_data(google_sheet_link):
+@dataclass(frozen=True)
+class SheetSnapshot:
   """
-    Fetches basic data from a Google Sheet.
+    Everything a hook task reads from its sheet, fetched once: the cell
+    values (as values:batchGet returns them) and the coloured words of
+    every cell, row by row. Shared read-only by the TTS and render stages.
+    """
+  spreadsheet_id: str
+  values: tuple
+  word_colors: tuple
+  # Drive modifiedTime of the spreadsheet when it was fetched, if known
+  modified_time: str = None
+  # Rows in the grid of Sheet1, blank ones included; only set on pages
+  grid_rows: int = None
+
+  def row_word_colors(self, idx):
+    """The word colour data of row `idx`, empty for rows without any."""
+    return self.word_colors[idx] if idx < len(self.word_colors) else ()
+
+  def to_dict(self):
+    return {
+      'spreadsheet_id': self.spreadsheet_id,
+      'values': self.values,
+      'word_colors': self.word_colors,
+      'modified_time': self.modified_time,
+    }
+
+  @classmethod
+  def from_dict(cls, data):
+    word_colors = tuple(
+      tuple(
+        None if cell is None else [
+          {'text': word['text'], 'color': tuple(word['color'])} for word in cell
+        ]
+        for cell in row
+      )
+      for row in data['word_colors']
+    )
+    return cls(
+      data['spreadsheet_id'],
+      tuple(tuple(row) for row in data['values']),
+      word_colors,
+      data.get('modified_time'),
+    )
+
+# Fetch the values and text formatting of the sheet in one request
+def fetch_sheet_snapshot(google_sheet_link, first_row=0, row_count=None):
+  """
+    Fetches a SheetSnapshot of the used range of Sheet1, or of its
+    `row_count` rows from `first_row` (0-based) on for a single page.
     """
   sheet_values = None
 
   try:
     spreadsheet_id = extract_spreadsheet_id(google_sheet_link)
-    url = f"https://sheets.googleapis.com/v4/spreadsheets/{spreadsheet_id}/values:batchGet?ranges=Sheet1&key={settings.GOOGLE_API_KEY}"
-    logger.info(f"Fetching data from URL: {url}")
+    sheet_range = 'Sheet1' if row_count is None else \
+      f'Sheet1!{first_row + 1}:{first_row + row_count}'
+    logger.info(f"Fetching {sheet_range} of sheet {spreadsheet_id}")
+
+    # Read before the cells, so an edit made in between is seen as a change
+    modified_time = fetch_sheet_modified_time(spreadsheet_id) \
+      if first_row == 0 else None
 
-    response = requests.get(url)
+    response = requests.get(
+      f"https://sheets.googleapis.com/v4/spreadsheets/{spreadsheet_id}",
+      params={
+        'ranges': sheet_range,
+        'includeGridData': 'true',
+        'fields': (
+          'sheets.properties.gridProperties.rowCount,'
+          'sheets.data.rowData.values(formattedValue,effectiveValue,textFormatRuns)'
+        ),
+        'key': settings.GOOGLE_API_KEY,
+      }
+    )
     response.raise_for_status()  # Raises an exception for 4xx/5xx responses
 
-    data = response.json()
-    sheet_values = data['valueRanges'][0].get('values', [])
+    snapshot = parse_sheet_snapshot(
+      spreadsheet_id, response.json(), modified_time
+    )
+    sheet_values = snapshot.values
 
-    if len(sheet_values) == 0:
+    if len(sheet_values) == 0 and first_row == 0:
       logger.error(f"Empty Spreadsheet: {sheet_values}")
       raise Exception('Spreadsheet Is Empty')
 
     logger.debug(f"Data fetched: {sheet_values}")
-    return sheet_values
+    return snapshot
   except requests.exceptions.RequestException as e:
     logger.error(f"Request failed: {e}")
     raise Exception(
@@ -56,27 +121,80 @@ def fetch_google_sheet_data(google_sheet_link):
     logger.error(f"Error extracting spreadsheet ID: {ve}")
     raise Exception(f"Your Spreadsheet ID Is Incorrect")
   except Exception as e:
-    if sheet_values is not None and len(sheet_values) == 0:
+    if sheet_values is not None and len(sheet_values) == 0 and first_row == 0:
       logger.error(f"Empty Spreadsheet: {sheet_values}")
       raise Exception('Spreadsheet Is Empty')
 
     logger.error(f"Unexpected error: {e}")
     raise Exception(f"Unexpected Error Happend, Please Try Again Later")
 
-# Fetch data from Google Sheets API
-def fetch_google_sheet_data_with_formatting(spreadsheet_id, api_key):
-  url = (
-    f'https://sheets.googleapis.com/v4/spreadsheets/{spreadsheet_id}'
-    f'?fields=sheets.data.rowData.values.effectiveValue,sheets.data.rowData.values.textFormatRuns&key={api_key}'
+# Build a snapshot from a spreadsheets.get response with grid data
+def parse_sheet_snapshot(spreadsheet_id, data, modified_time=None):
+  """
+    Trailing empty cells and rows are dropped, as values:batchGet does, so
+    row indexes of values and word colours line up.
+    """
+  sheets = data.get('sheets') or [{}]
+  grid = (sheets[0].get('data') or [{}])[0]
+  grid_rows = sheets[0].get('properties', {}).get('gridProperties', {}).get('rowCount')
+
+  values = []
+  word_colors = []
+  for row in grid.get('rowData', []):
+    cells = [cell.get('formattedValue', '') for cell in row.get('values', [])]
+    while cells and cells[-1] == '':
+      cells.pop()
+    values.append(tuple(cells))
+    word_colors.append(tuple(process_row(row)))
+
+  while values and not values[-1]:
+    values.pop()
+
+  return SheetSnapshot(
+    spreadsheet_id, tuple(values), tuple(word_colors[:len(values)]),
+    modified_time, grid_rows
   )
 
+# Last modification time of the spreadsheet file
+def fetch_sheet_modified_time(spreadsheet_id):
+  """
+    Returns the Drive modifiedTime of the spreadsheet, or None when Drive
+    does not tell (API not enabled for the key, private file, ...).
+    """
+  url = (
+    f"https://www.googleapis.com/drive/v3/files/{spreadsheet_id}"
+    f"?fields=modifiedTime&supportsAllDrives=true&key={settings.GOOGLE_API_KEY}"
+  )
   try:
-    response = requests.get(url)
+    response = requests.get(url, timeout=10)
     response.raise_for_status()
-    return response.json()
-  except requests.exceptions.RequestException as e:
-    logger.error("Failed to fetch data from Google Sheets API: %s", str(e))
-    raise
+    return response.json().get('modifiedTime')
+  except (requests.exceptions.RequestException, ValueError) as e:
+    logger.debug(f"No modifiedTime for sheet {spreadsheet_id}: {e}")
+    return None
+
+# Fetch the sheet page by page
+def iter_sheet_pages(google_sheet_link, page_size):
+  """
+    Yields `(first_row, page)` SheetSnapshots of `page_size` rows each up to
+    the end of the grid, so the rows of a large sheet can be worked on before
+    all of it has been downloaded and parsed. Pages drop their trailing blank
+    rows and may be empty; rows after a blank run still come in later pages.
+    Without a grid size the pages stop at the first empty one.
+    """
+  first_row = 0
+  row_count = page_size
+  while True:
+    page = fetch_sheet_snapshot(google_sheet_link, first_row, row_count)
+    if page.grid_rows is None and not page.values:
+      return
+    yield first_row, page
+    first_row += page_size
+    if page.grid_rows is not None:
+      if first_row >= page.grid_rows:
+        return
+      # Never ask for rows past the grid, the API rejects such ranges
+      row_count = min(page_size, page.grid_rows - first_row)
 
 # Parse text and formatting from a cell
 def parse_cell_text_and_format(cell):
@@ -172,27 +290,3 @@ def process_row(row):
       logger.warning("Error processing row data: %s", str(e))
       row_data.append(None)  # Add None if there's an error in processing
   return row_data
-
-# Main function to fetch and process word color data
-def extract_word_color_data(google_sheet_link):
-  try:
-    # Extract the spreadsheet ID from the URL
-    api_key = settings.GOOGLE_API_KEY
-    spreadsheet_id = extract_spreadsheet_id(google_sheet_link)
-
-    # Fetch data from Google Sheets API
-    data = fetch_google_sheet_data_with_formatting(spreadsheet_id, api_key)
-    rows = data['sheets'][0]['data'][0]['rowData']
-
-    # Process each row
-    sheet_data = []
-    for row in rows:
-      row_data = process_row(row)
-      sheet_data.append(row_data)
-
-    logger.info("Successfully fetched and processed word color data")
-    return sheet_data
-
-  except Exception as e:
-    logger.error("Failed to fetch and process word color data: %s", str(e))
-    return None
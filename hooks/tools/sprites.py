@@ -0,0 +1,80 @@
+# Decoded, pre-scaled image assets shared by every render in the process
+import functools
+import logging
+import os
+from collections import namedtuple
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from .utils import OUTPUT_DIMENSIONS
+
+logging.basicConfig(level=logging.DEBUG)
+
+WATERMARK_PATH = os.path.join(os.path.dirname(__file__), 'watermark.png')
+
+# The watermark is drawn wider than the video and centred, as it always was.
+WATERMARK_EXTRA_WIDTH = 650
+
+# The part of the scaled watermark that falls inside the frame, as a PIL
+# RGBA image, and where its top-left corner goes.
+WatermarkSprite = namedtuple('WatermarkSprite', ['image', 'position'])
+
+
+def _hashable_color(color):
+    return color if isinstance(color, str) else tuple(color)
+
+
+def _read_only(array):
+    array.setflags(write=False)
+    return array
+
+
+@functools.lru_cache(maxsize=1)
+def load_watermark(path=WATERMARK_PATH):
+    """Decode the watermark once per process; callers must not modify it."""
+    return _read_only(np.array(Image.open(path).convert('RGBA')))
+
+
+@functools.lru_cache(maxsize=256)
+def _rounded_rectangle(width, height, radius, color):
+    img = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    draw.rounded_rectangle((0, 0, width, height), radius=radius, fill=color)
+    return _read_only(np.array(img))
+
+
+def rounded_rectangle_sprite(width, height, radius, color):
+    """Return a read-only RGBA array of a filled rounded rectangle."""
+    return _rounded_rectangle(
+        int(width), int(height), radius, _hashable_color(color)
+    )
+
+
+@functools.lru_cache(maxsize=8)
+def _scaled_watermark(width, path):
+    watermark = load_watermark(path)
+    height = int(round(width * watermark.shape[0] / watermark.shape[1]))
+    return Image.fromarray(watermark, 'RGBA').resize((width, height), Image.LANCZOS)
+
+
+@functools.lru_cache(maxsize=16)
+def watermark_sprite(width, height, path=WATERMARK_PATH):
+    """The watermark scaled for a `width` x `height` frame, cropped to the frame."""
+    scaled = _scaled_watermark(width + WATERMARK_EXTRA_WIDTH, path)
+    wm_width, wm_height = scaled.size
+
+    x = (width - wm_width) // 2
+    y = (height - wm_height) // 2
+    left, top = max(0, -x), max(0, -y)
+    visible = scaled.crop(
+        (left, top, min(wm_width, width - x), min(wm_height, height - y))
+    )
+    return WatermarkSprite(visible, (max(0, x), max(0, y)))
+
+
+def prewarm_sprites():
+    """Scale the watermark for every supported output size up front."""
+    for width, height in OUTPUT_DIMENSIONS.values():
+        watermark_sprite(width, height)
+    logging.info(f"Prewarmed watermark sprites for {len(OUTPUT_DIMENSIONS)} sizes")
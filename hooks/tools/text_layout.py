@@ -0,0 +1,115 @@
+# Font-metrics based text measurement and line breaking for hook overlays
+import logging
+from collections import namedtuple
+
+from .font_utils import get_font_registry
+
+logging.basicConfig(level=logging.DEBUG)
+
+# Largest font size that fits, its wrapped text height and how many text
+# measurements the search needed.
+FitResult = namedtuple('FitResult', ['size', 'height', 'measurements'])
+
+
+def load_font(size):
+    """Return the hook font at the given pixel size from the font registry."""
+    return get_font_registry().face(size)
+
+
+def text_width(text, size):
+    """Width in pixels of `text` laid out on a single line."""
+    return load_font(size).getlength(text)
+
+
+def break_first_line(text, size, max_width):
+    """
+    Split `text` at the point where it first wraps in a box `max_width` wide.
+
+    Returns `(first_line, rest)`, with `rest` empty when everything fits on
+    one line. This reproduces the old approach of rendering every prefix until
+    it grew a second line and backing off to the previous space, but measures
+    prefix widths from the font metrics instead of rasterizing them.
+    """
+    # Prefix widths only grow, so the first prefix that overflows can be
+    # found by bisection: the smallest i with text[:i + 1] wider than the box.
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high) // 2
+        if text_width(text[:mid + 1].rstrip(), size) > max_width:
+            high = mid
+        else:
+            low = mid + 1
+
+    if low >= len(text):
+        return text, ''
+
+    for j in range(low, 0, -1):
+        if text[j].isspace():
+            return text[0:j].strip(), text[j + 1:len(text)].strip()
+
+    return text, ''
+
+
+def wrap_lines(text, size, max_width):
+    """
+    Greedily wrap `text` into the lines it takes in a box `max_width` wide.
+    A word wider than the box gets a line of its own, as Pango gives it,
+    rather than taking the rest of the text along like break_first_line.
+    """
+    lines = []
+    rest = text.strip()
+    while rest:
+        line, next_rest = break_first_line(rest, size, max_width)
+        if not next_rest and text_width(line.rstrip(), size) > max_width:
+            parts = line.split(None, 1)
+            line, next_rest = parts[0], parts[1] if len(parts) > 1 else ''
+        lines.append(line)
+        if next_rest == rest:
+            break
+        rest = next_rest
+    return lines
+
+
+def line_height(size):
+    """Height in pixels of one line of text, ascent plus descent."""
+    ascent, descent = load_font(size).getmetrics()
+    return ascent + descent
+
+
+def text_block_height(text, size, max_width):
+    """Height in pixels of `text` wrapped in a box `max_width` wide."""
+    return max(1, len(wrap_lines(text, size, max_width))) * line_height(size)
+
+
+def fit_font_size(text, max_size, max_height, max_width):
+    """
+    Find the largest font size, stepping down from `max_size` by whole points
+    as the old loop did, whose wrapped text is at most `max_height` tall.
+
+    Uses binary search over those steps, so a size that starts far too large
+    costs a handful of measurements instead of one full render per point.
+    """
+    measurements = 0
+    heights = {}
+
+    def height_at(step):
+        nonlocal measurements
+        if step not in heights:
+            measurements += 1
+            heights[step] = text_block_height(text, max_size - step, max_width)
+        return heights[step]
+
+    # Steps keep the fractional part of `max_size` and never go below 1.
+    last_step = max(0, int(max_size - 1))
+    if height_at(0) <= max_height or last_step == 0:
+        return FitResult(max_size, heights[0], measurements)
+
+    low, high = 1, last_step
+    while low < high:
+        mid = (low + high) // 2
+        if height_at(mid) <= max_height:
+            high = mid
+        else:
+            low = mid + 1
+
+    return FitResult(max_size - low, height_at(low), measurements)
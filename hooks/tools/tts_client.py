@@ -0,0 +1,217 @@
+# Pooled, rate-limit-aware client for the ElevenLabs text-to-speech API
+import email.utils
+import hashlib
+import logging
+import random
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logging.basicConfig(level=logging.DEBUG)
+
+API_URL = 'https://api.elevenlabs.io/v1'
+
+# Responses worth another attempt: rate limited, or a transient server error.
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+DEFAULT_MODEL_ID = 'eleven_monolingual_v1'
+DEFAULT_VOICE_SETTINGS = {
+    'stability': 0.5,
+    'similarity_boost': 0.75
+}
+
+# Concurrent requests ElevenLabs allows per subscription tier.
+TIER_CONCURRENCY = {
+    'free': 2,
+    'starter': 3,
+    'creator': 5,
+    'pro': 10,
+    'scale': 15,
+    'business': 15,
+}
+
+
+class TTSError(Exception):
+    """A text-to-speech request that failed for good."""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def retry_after_seconds(response):
+    """Seconds a Retry-After header asks to wait, or None without one."""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_seconds(attempt, base, cap):
+    """Exponential backoff with full jitter for retry `attempt` (0-based)."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class ElevenLabsClient:
+    """
+    Shares one pooled HTTP session between all threads of the process and
+    caps the requests in flight per API key, since every user brings their
+    own key with its own plan limits. Rate limited and transient failures
+    are retried with backoff, honouring Retry-After up to `backoff_cap`.
+    """
+
+    def __init__(self, max_retries=5, backoff_base=1.0, backoff_cap=30.0,
+                 default_concurrency=3, max_concurrency=15, timeout=(10, 120)):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.default_concurrency = default_concurrency
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_concurrency * 4)
+        self.session.mount('https://', adapter)
+
+        self._lock = threading.Lock()
+        self._limits = {}
+        self._semaphores = {}
+
+    @staticmethod
+    def _key_id(api_key):
+        # Keys are only held in memory hashed, and logged by this prefix.
+        return hashlib.sha256((api_key or '').encode('utf-8')).hexdigest()[:12]
+
+    def key_concurrency(self, api_key):
+        """
+        Requests the key may have in flight, from its subscription tier, read
+        once per process. Falls back to `default_concurrency`.
+        """
+        key_id = self._key_id(api_key)
+        with self._lock:
+            if key_id in self._limits:
+                return self._limits[key_id]
+
+        limit = self.default_concurrency
+        try:
+            response = self.session.get(
+                f'{API_URL}/user/subscription',
+                headers={'xi-api-key': api_key},
+                timeout=self.timeout,
+            )
+            if response.status_code == 200:
+                tier = (response.json().get('tier') or '').lower()
+                limit = next(
+                    (n for name, n in TIER_CONCURRENCY.items() if tier.startswith(name)),
+                    self.default_concurrency
+                )
+        except (requests.exceptions.RequestException, ValueError) as err:
+            logging.warning(f"Could not read the ElevenLabs tier of key {key_id}: {err}")
+
+        limit = max(1, min(limit, self.max_concurrency))
+        with self._lock:
+            self._limits.setdefault(key_id, limit)
+            return self._limits[key_id]
+
+    def _semaphore(self, api_key):
+        limit = self.key_concurrency(api_key)
+        key_id = self._key_id(api_key)
+        with self._lock:
+            if key_id not in self._semaphores:
+                self._semaphores[key_id] = threading.BoundedSemaphore(limit)
+            return self._semaphores[key_id]
+
+    def _post(self, api_key, url, payload, headers):
+        """POST under the key's concurrency cap, retrying 429s and 5xx."""
+        key_id = self._key_id(api_key)
+        semaphore = self._semaphore(api_key)
+
+        for attempt in range(self.max_retries + 1):
+            with semaphore:
+                try:
+                    response = self.session.post(
+                        url, json=payload, headers=headers, timeout=self.timeout
+                    )
+                except (requests.exceptions.ConnectionError,
+                        requests.exceptions.Timeout) as err:
+                    if attempt == self.max_retries:
+                        raise TTSError(f"ElevenLabs request failed: {err}") from err
+                    response = None
+                    error = str(err)
+
+            if response is not None:
+                if response.status_code == 200:
+                    return response
+                error = f"status code {response.status_code}: {response.text[:500]}"
+                if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                    logging.error(f"API request failed with {error}")
+                    raise TTSError(
+                        f"API request failed with status code {response.status_code}",
+                        response.status_code
+                    )
+
+            # Sleep outside the semaphore so other rows of the key can go ahead.
+            delay = retry_after_seconds(response) if response is not None else None
+            if delay is None:
+                delay = backoff_seconds(attempt, self.backoff_base, self.backoff_cap)
+            elif delay > self.backoff_cap:
+                # Waiting that long would stall the task; fail the row instead
+                logging.error(
+                    f"ElevenLabs asked key {key_id} to wait {delay:.0f}s, "
+                    f"more than the {self.backoff_cap:.0f}s cap"
+                )
+                raise TTSError(
+                    f"API request failed with status code {response.status_code}",
+                    response.status_code
+                )
+            logging.warning(
+                f"ElevenLabs request for key {key_id} failed ({error}), "
+                f"retry {attempt + 1}/{self.max_retries} in {delay:.1f}s"
+            )
+            time.sleep(delay)
+
+    def text_to_speech(self, api_key, text, voice_id, model_id=DEFAULT_MODEL_ID,
+                       voice_settings=None):
+        """Synthesize `text` with `voice_id` and return the MP3 bytes."""
+        response = self._post(
+            api_key,
+            f'{API_URL}/text-to-speech/{voice_id}',
+            {
+                'text': text,
+                'model_id': model_id,
+                'voice_settings': voice_settings or DEFAULT_VOICE_SETTINGS
+            },
+            {
+                'Accept': 'audio/mpeg',
+                'Content-Type': 'application/json',
+                'xi-api-key': api_key
+            },
+        )
+        return response.content
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_tts_client():
+    """Return the process-wide ElevenLabs client configured from settings."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ElevenLabsClient(
+                max_retries=settings.ELEVENLABS_MAX_RETRIES,
+                default_concurrency=settings.HOOK_TTS_CONCURRENCY,
+                max_concurrency=settings.ELEVENLABS_MAX_KEY_CONCURRENCY,
+            )
+        return _client
@@ -4,6 +4,14 @@ import shutil
 import string
 import random
 
+# Output (width, height) for each Hook.dimension option.
+OUTPUT_DIMENSIONS = {
+    'option1': (1080, 1080),
+    'option2': (1080, 1350),
+    'option3': (1080, 1920),
+    'option4': (1920, 1080),
+}
+
 def hex_to_rgb(hex_color):
     """Convert hex color to RGB tuple."""
     hex_color = hex_color.lstrip('#')
@@ -1,37 +1,123 @@
 # Utility functions used in video processing
 import logging
+import math
 import os
 import re
-import shutil
 from hooks.models import Hook
+from utils.encoding import get_encoding_profile, moviepy_write_kwargs
+from utils.probe import probe_media
 from moviepy.editor import VideoFileClip, TextClip, ColorClip, CompositeVideoClip, ImageClip, concatenate_videoclips
 from moviepy.video.fx.all import crop
-from .utils import split_hook_text
-from .font_utils import setup_fontconfig
+from .font_utils import get_font_registry
+from .overlay import OverlayLayer
+from .overlay_cache import get_overlay_cache, overlay_cache_key
+from .segment_cache import assemble_background, can_stream_copy
+from .sprites import rounded_rectangle_sprite, watermark_sprite
+from .layout import Box, HookStyle, LayoutRow, compute_hook_layout
+from .text_layout import load_font
 import numpy as np
 from django.conf import settings
 from PIL import Image, ImageDraw
 
 logging.basicConfig(level=logging.DEBUG)
 
-def create_rounded_rectangle(width, height, radius, color):
-  img = Image.new('RGBA', (width, height), (0, 0, 0, 0))
-  draw = ImageDraw.Draw(img)
-  draw.rounded_rectangle((0, 0, width, height), radius=radius, fill=color)
-  return img
-
-def create_bg_for_text_clip(text_clip, radius, color, hpadding, vpadding):
-  return ImageClip(
-    np.array(
-      create_rounded_rectangle(
-        text_clip.size[0] + hpadding, text_clip.size[1] + vpadding, radius,
-        color
-      )
+def rgb_to_hex(color):
+  return "#{:02x}{:02x}{:02x}".format(*color)
+
+class TextRenderer:
+  """
+  Rasterizes runs of `(text, color)` into an ImageClip with a mask.
+
+  A run's color may be None to use the default `color`. With `width` the
+  text wraps and is centred in a box that wide, otherwise the clip is just
+  as wide as the text.
+  """
+  name = None
+
+  def render(self, runs, fontsize, color, width=None):
+    raise NotImplementedError
+
+class PangoTextRenderer(TextRenderer):
+  """Renders Pango markup through ImageMagick, one subprocess per call."""
+  name = 'pango'
+
+  def markup(self, runs):
+    markup = ''
+    for text, run_color in runs:
+      word = text.rstrip()
+      if run_color is None:
+        markup += f'<span font_desc="Mu Font">{word}</span>'
+      else:
+        markup += f'<span font_desc="Mu Font" foreground="{rgb_to_hex(run_color)}">{word}</span>'
+      markup += text[len(word):]
+    return markup.strip()
+
+  def render(self, runs, fontsize, color, width=None):
+    return TextClip(
+      self.markup(runs),
+      size=(width, None) if width else None,
+      method='pango',  # Enable Pango markup
+      fontsize=fontsize,
+      color=color,  # Default color, overridden by Pango markup
+      align='center'
     )
-  )
+
+class PillowTextRenderer(TextRenderer):
+  """Rasterizes mu.otf in-process with FreeType, straight into a NumPy array."""
+  name = 'pillow'
+
+  def wrap(self, runs, fontsize, width):
+    font = load_font(fontsize)
+    words = [
+      (word, run_color)
+      for text, run_color in runs
+      for word in re.findall(r'\S+\s*', text)
+    ]
+
+    lines = [[]]
+    for word in words:
+      candidate = ''.join(text for text, _ in lines[-1] + [word]).rstrip()
+      if width and lines[-1] and font.getlength(candidate) > width:
+        lines.append([])
+      lines[-1].append(word)
+    return [line for line in lines if line]
+
+  def render(self, runs, fontsize, color, width=None):
+    font = load_font(fontsize)
+    lines = self.wrap(runs, fontsize, width) or [[]]
+    line_widths = [
+      font.getlength(''.join(text for text, _ in line).rstrip())
+      for line in lines
+    ]
+    ascent, descent = font.getmetrics()
+    line_h = ascent + descent
+
+    image_w = int(math.ceil(width if width else max(line_widths, default=0))) or 1
+    image = Image.new('RGBA', (image_w, line_h * len(lines)), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    for i, (line, line_w) in enumerate(zip(lines, line_widths)):
+      x = (image_w - line_w) / 2
+      for text, run_color in line:
+        draw.text((x, i * line_h), text, font=font, fill=run_color or color)
+        x += font.getlength(text)
+
+    return ImageClip(np.array(image))
+
+TEXT_RENDERERS = {
+  PangoTextRenderer.name: PangoTextRenderer(),
+  PillowTextRenderer.name: PillowTextRenderer(),
+}
+
+def get_text_renderer(name=None):
+  """Return the configured text renderer, see HOOK_TEXT_RENDERER."""
+  return TEXT_RENDERERS[name or settings.HOOK_TEXT_RENDERER]
 
 def crop_to_aspect_ratio(video_clip, target_width, target_height):
   original_width, original_height = video_clip.size
+  # Normalized sources already have the output size
+  if (original_width, original_height) == (target_width, target_height):
+    return video_clip
+
   target_aspect_ratio = target_width / target_height
   original_aspect_ratio = original_width / original_height
 
@@ -59,454 +145,98 @@ def crop_to_aspect_ratio(video_clip, target_width, target_height):
 
   return cropped_clip
 
-def create_custom_text_clip(
-  hook_text, OUT_VIDEO_WIDTH, OUT_VIDEO_HEIGHT, top_box_color, text_color,
-  font_size, word_color_data, is_tiktok
-):
-  try:
-    orig_hook_text_parts = split_hook_text(hook_text)
-
-    hook_text = ' '.join(
-      [word['text'] for cell in word_color_data for word in cell]
-    )
-    hook_text_parts = split_hook_text(hook_text)
-    logging.info(f"Hook text parts: {hook_text_parts}")
-
-    x_multiplier = OUT_VIDEO_WIDTH / 360
-    y_multiplier = OUT_VIDEO_HEIGHT / 450
-    min_red_area_h = int(round(40 * y_multiplier))
-
-    fontsize1 = int(round(15 * x_multiplier))
-    if is_tiktok == 1:
-      fontsize1 += 18
-    if OUT_VIDEO_WIDTH == 1920 and OUT_VIDEO_HEIGHT == 1080:
-      fontsize1 -= 20
-
-    max_width = OUT_VIDEO_WIDTH - 100
-    logging.info(f'Variables created successfully')
-    x_margin = 5
-
-    # Setup Fontconfig for custom font
-    font_path = os.path.abspath(
-      str(settings.BASE_DIR) + '/dependencies/fonts/mu.otf'
-    )
-    logging.info(f"Font path: {font_path}")
-    temp_fontconfig_dir = setup_fontconfig(font_path)
-
-    text_clip1 = TextClip(
-      f'<span font_desc="Mu Font">{hook_text_parts[0].strip()}</span>',  # Pango-formatted string with word colors
-      size=(max_width, None),
-      method='pango',  # Enable Pango markup
-      fontsize=fontsize1,
-      color='white',  # Default color, overridden by Pango markup
-      align='center'
-    )
-
-    # Get the dimensions of the first text clip
-    _, text_clip1_h = text_clip1.size
-    if text_clip1_h > (min_red_area_h - 10):
-      if is_tiktok:
-        while text_clip1_h > (min_red_area_h - 10) and fontsize1 > 1:
-          fontsize1 -= 1
-
-          text_clip1 = TextClip(
-            f'<span font_desc="Mu Font">{hook_text_parts[0].strip()}</span>',  # Pango-formatted string with word colors
-            size=(max_width, None),
-            method='pango',  # Enable Pango markup
-            fontsize=fontsize1,
-            color='white',  # Default color, overridden by Pango markup
-            align='center'
-          )
-
-          _, text_clip1_h = text_clip1.size
+def render_layout_clip(plan, text_renderer=None):
+  """Rasterize a LayoutPlan into a static CompositeVideoClip with a mask."""
+  text_renderer = text_renderer or get_text_renderer()
+  clips = []
+  for element in plan.elements:
+    if isinstance(element, Box):
+      if element.radius:
+        clip = ImageClip(rounded_rectangle_sprite(
+          element.width, element.height, element.radius, element.color
+        ))
       else:
-        min_red_area_h = text_clip1_h + 10
-
-    first_line = hook_text_parts[0]
-    second_line = ''
-    if is_tiktok:
-      single_line_height = TextClip(
-        '<span font_desc="Mu Font">A</span>',
-        size=(max_width, None),
-        method='pango',
-        fontsize=fontsize1,
-        color='white',
-        align='center',
-      ).size[1]
-
-      for i in range(0, len(hook_text_parts[0])):
-        temp_hook_text = f'<span font_desc="Mu Font">{hook_text_parts[0][0:i + 1]}</span>'
-
-        temp_text_clip = TextClip(
-          temp_hook_text.strip(),
-          size=(max_width, None),
-          method='pango',
-          fontsize=fontsize1,
-          color='white',
-          align='center',
-        )
-
-        if temp_text_clip.size[1] > single_line_height:
-          for j in range(i, 0, -1):
-            if hook_text_parts[0][j].isspace():
-              first_line = hook_text_parts[0][0:j].strip()
-              second_line = hook_text_parts[0][j + 1:len(hook_text_parts[0])
-                                               ].strip()
-              break
-          break
-
-    # Build Pango-formatted text string with color for each word for the first part only
-    pango_text = ""
-    first_line_pango = ""
-    second_line_pango = ""
-    word_index = 0
-    char_index = 0
-    words_in_first_part = hook_text_parts[0].split()
-    text_clips_ = []
-    orig_hook_first_part_text = re.sub(r'\s+', ' ', orig_hook_text_parts[0])
-    for word_data in word_color_data:
-      for word_info in word_data:
-        word = word_info['text'].capitalize()
-
-        # Only add the word to pango_text if it is in the first part
-        if word_index < len(
-            words_in_first_part
-        ) and word == words_in_first_part[word_index].capitalize():
-          color = word_info['color']
-
-          # Override the color only if it's not black
-          if color == (0, 0, 0):
-            color = text_color  # Use the front-end color if the color is black
-
-          color_hex = "#{:02x}{:02x}{:02x}".format(*color)
-          pango_word = f'<span font_desc="Mu Font" foreground="{color_hex}">{word}</span>'
-
-          char_index += len(word)
-          if char_index < len(
-              orig_hook_first_part_text
-          ) and orig_hook_first_part_text[char_index] == ' ':
-            pango_word += ' '
-            char_index += 1
-
-          if word_index < len(first_line.split(' ')):
-            first_line_pango += pango_word
-          else:
-            second_line_pango += pango_word
-
-          pango_text += pango_word
-
-          word_index += 1
-    logging.info(f"Pango-formatted text: {pango_text}")
-
-    # Create background clip for the first part
-    bg_clip1 = ColorClip(
-      size=(OUT_VIDEO_WIDTH, min_red_area_h), color=top_box_color
-    )
-
-    text_clip1_y_offset = (min_red_area_h-text_clip1_h) / 2
-
-    clips = []
-    second_line_bg = None
-
-    if is_tiktok == 1:
-      padding_top = 570
-
-      text_clip1_y_offset += (padding_top / 2)
-      min_red_area_h += (padding_top / 2)
-      padding_left = 0
-
-      radius = 20
-      hpadding = 50
-      vpadding = 30
-
-      first_line_text_clip = TextClip(
-        first_line_pango.strip(),
-        method='pango',
-        fontsize=fontsize1,
-        color='white',
-        align='center',
-      )
-
-      first_line_bg = create_bg_for_text_clip(
-        first_line_text_clip, radius, top_box_color, hpadding, vpadding
-      )
-
-      if second_line != '':
-        second_line_text_clip = TextClip(
-          second_line_pango.strip(),
-          method='pango',
-          fontsize=fontsize1,
-          color='white',
-          align='center',
-        )
-
-        second_line_bg = create_bg_for_text_clip(
-          second_line_text_clip, radius, top_box_color, hpadding, vpadding
-        )
-
-        clips.append(
-          second_line_bg.set_position(
-            (
-              'center', text_clip1_y_offset + first_line_bg.size[1] - radius - 1
-            )
-          ),
-        )
-        clips.append(
-          second_line_text_clip.set_position(
-            (
-              'center',
-              text_clip1_y_offset + first_line_bg.size[1] - radius - 1 +
-              (vpadding/2)
-            )
-          ),
-        )
-
-      clips.append(first_line_bg.set_position(('center', text_clip1_y_offset)))
-      clips.append(
-        first_line_text_clip.set_position(
-          ('center', text_clip1_y_offset + (vpadding/2))
+        clip = ColorClip(
+          size=(int(element.width), int(element.height)), color=element.color
         )
-      )
-
-      final_clip = CompositeVideoClip(
-        clips, size=(OUT_VIDEO_WIDTH, OUT_VIDEO_HEIGHT)
-      )
+      clips.append(clip.set_position((element.x, element.y)))
     else:
-      text_clip1 = TextClip(
-        pango_text.strip(),  # Pango-formatted string with word colors
-        size=(max_width, None),
-        method='pango',  # Enable Pango markup
-        fontsize=fontsize1,
-        color='white',  # Default color, overridden by Pango markup
-        align='center'
-      )
-
-      final_clip = CompositeVideoClip(
-        [
-          bg_clip1.set_position((0, 0)),
-          text_clip1.set_position(("center", text_clip1_y_offset)),
-        ],
-        size=(OUT_VIDEO_WIDTH, OUT_VIDEO_HEIGHT)
+      clip = text_renderer.render(
+        element.runs, element.font_size, element.color,
+        width=element.width if element.wrap else None
       )
+      # Centre what the renderer drew in the slot the plan measured.
+      x = element.x + (element.width - clip.size[0]) / 2
+      clips.append(clip.set_position((x, element.y)))
+
+  return CompositeVideoClip(clips, size=(plan.width, plan.height))
+
+def build_overlay_layer(plan, add_watermark=False):
+  """
+  Return the flattened text (and watermark) layer for a LayoutPlan, rendering
+  it only when no identical overlay is in the overlay cache.
+  """
+  text_renderer = get_text_renderer()
+  key = overlay_cache_key(
+    plan, add_watermark, text_renderer.name, get_font_registry().font_hash
+  )
 
-    # Process the second part (after the hyphen) if it exists
-    if len(hook_text_parts) > 1:
-      min_white_area_h = int(round(30 * y_multiplier))
-      fontsize2 = int(round(15 * 0.6 * x_multiplier))
-
-      if is_tiktok:
-        fontsize2 += 18 * 0.6
-      elif OUT_VIDEO_WIDTH == 1920 and OUT_VIDEO_HEIGHT == 1080:
-        fontsize2 -= 20 * 0.6
-      else:
-        fontsize2 += 6
-      second_part_text = hook_text_parts[1]
-
-      # Create TextClip for the second part with Pango-formatted text
-      text_clip2 = TextClip(
-        f'<span font_desc="Mu Font">{hook_text_parts[1].strip()}</span>',
-        size=(OUT_VIDEO_WIDTH - (x_margin*2), 0),
-        method='pango',  # Enable Pango markup
-        fontsize=fontsize2,
-        color='black',  # Default color, overridden by Pango markup
-        align='center',
-      )
-
-      _, text_clip2_h = text_clip2.size
-      if text_clip2_h > min_white_area_h:
-        if is_tiktok:
-          while text_clip2_h > min_white_area_h and fontsize2 > 1:
-            fontsize2 -= 1
-
-            text_clip2 = TextClip(
-              f'<span font_desc="Mu Font">{hook_text_parts[1].strip()}</span>',
-              size=(max_width * 0.8, 0),
-              method='pango',  # Enable Pango markup
-              fontsize=fontsize2,
-              color='black',  # Default color, overridden by Pango markup
-              align='center',
-            )
-
-            _, text_clip2_h = text_clip2.size
-        else:
-          min_white_area_h = text_clip2_h
-
-      first_line2 = hook_text_parts[1]
-      second_line2 = ''
-      if is_tiktok:
-        single_line_height = TextClip(
-          '<span font_desc="Mu Font">A</span>',
-          size=(max_width, None),
-          method='pango',
-          fontsize=fontsize2,
-          color='white',
-          align='center',
-        ).size[1]
-
-        for i in range(0, len(hook_text_parts[1])):
-          temp_hook_text = f'<span font_desc="Mu Font">{hook_text_parts[1][0:i + 1]}</span>'
-
-          temp_text_clip = TextClip(
-            temp_hook_text.strip(),
-            size=(max_width * 0.8, None),
-            method='pango',
-            fontsize=fontsize2,
-            color='white',
-            align='center',
-          )
-
-          if temp_text_clip.size[1] > single_line_height:
-            for j in range(i, 0, -1):
-              if hook_text_parts[1][j].isspace():
-                first_line2 = hook_text_parts[1][0:j].strip()
-                second_line2 = hook_text_parts[1][j + 1:len(hook_text_parts[1])
-                                                  ].strip()
-                break
-            break
-
-      # Build Pango-formatted text string with color for the second part
-      pango_text2 = ""
-      first_line_pango2 = ""
-      second_line_pango2 = ""
-      word_index_second = 0
-      words_in_second_part = second_part_text.split()
-      for word_info in word_data:
-        word = word_info['text'].capitalize()
-
-        # Ensure word is part of the second part
-        if word_index_second < len(
-            words_in_second_part
-        ) and word == words_in_second_part[word_index_second].capitalize():
-          color = word_info['color']
-
-          if color == (255, 255, 255):
-            color = (0, 0, 0)  # Use default color if the color is black
-
-          color_hex = "#{:02x}{:02x}{:02x}".format(*color)
-          pango_word = f'<span font_desc="Mu Font" foreground="{color_hex}">{word}</span> '
-
-          if word_index_second < len(first_line2.split(' ')):
-            first_line_pango2 += pango_word
-          else:
-            second_line_pango2 += pango_word
-
-          pango_text2 += pango_word
-
-          word_index_second += 1
-
-      # Create background clip for the second part
-      bg_clip2 = ColorClip(
-        size=(OUT_VIDEO_WIDTH, min_white_area_h), color=(255, 255, 255)
-      )
-
-      text_clip2_y_offset = min_red_area_h + (min_white_area_h-text_clip2_h) / 2
-
-      if is_tiktok:
-        radius2 = 15
-        hpadding2 = 40
-        vpadding2 = 20
-
-        second_part_margin = 20
-
-        first_line_text_clip2 = TextClip(
-          first_line_pango2.strip(),
-          method='pango',
-          fontsize=fontsize2,
-          color='black',
-          align='center',
-        )
+  def render():
+    logging.info('Rendering the hook layout')
+    custom_text_clip = render_layout_clip(plan, text_renderer)
+    logging.info('Flattening overlay and watermark into a single layer')
+    return OverlayLayer.from_clip(
+      custom_text_clip,
+      watermark_sprite(plan.width, plan.height) if add_watermark else None
+    )
 
-        first_line_bg2 = create_bg_for_text_clip(
-          first_line_text_clip2, radius2, (255, 255, 255), hpadding2, vpadding2
-        )
+  return get_overlay_cache().get_or_render(key, render)
 
-        first_part_end = text_clip1_y_offset + (
-          first_line_bg.size[1] +
-          (0 if second_line == '' else second_line_bg.size[1])
-        )
+def load_source_clips(video_files, each_video_duration, OUT_VIDEO_WIDTH, OUT_VIDEO_HEIGHT):
+  """Open, cut and crop each usable source video into a clip."""
+  video_clips = []
+  for considered_vid in video_files:
+    try:
+      # Ensure the video file exists
+      if not os.path.exists(considered_vid):
+        logging.error(f"Video file {considered_vid} does not exist.")
+        continue
 
-        if second_line2 != '':
-          second_line_text_clip2 = TextClip(
-            second_line_pango2.strip(),
-            method='pango',
-            fontsize=fontsize2,
-            color='black',
-            align='center',
-          )
-
-          second_line_bg2 = create_bg_for_text_clip(
-            second_line_text_clip2, radius2, (255, 255, 255), hpadding2,
-            vpadding2
-          )
-
-          clips.append(
-            second_line_bg2.set_position(
-              (
-                'center', first_part_end + second_part_margin
-                + first_line_bg2.size[1] - radius2 - 1
-              )
-            ),
-          )
-          clips.append(
-            second_line_text_clip2.set_position(
-              (
-                'center', first_part_end + second_part_margin
-                + first_line_bg2.size[1] - radius2 - 1 + (vpadding2/2)
-              )
-            ),
-          )
-
-        clips.append(
-          first_line_bg2.set_position(
-            ('center', first_part_end + second_part_margin)
-          )
-        )
-        clips.append(
-          first_line_text_clip2.set_position(
-            ('center', first_part_end + second_part_margin + (vpadding2/2))
-          )
+      # Skip unusable files before spawning a decoder for them
+      media_info = probe_media(considered_vid)
+      if not media_info.has_video or media_info.duration <= 0:
+        logging.error(
+          f"Video {considered_vid} has no video stream or an invalid duration. Skipping."
         )
+        continue
 
-        final_clip = CompositeVideoClip(
-          clips, size=(OUT_VIDEO_WIDTH, OUT_VIDEO_HEIGHT)
-        )
-      else:
-        text_clip2 = TextClip(
-          pango_text2.strip(),
-          size=(OUT_VIDEO_WIDTH - (x_margin*2), 0),
-          method='pango',  # Enable Pango markup
-          fontsize=fontsize2,
-          color='black',  # Default color, overridden by Pango markup
-          align='center',
-        )
+      # Log and process the video
+      logging.info(f'Processing video: {considered_vid}')
+      video_clip = VideoFileClip(considered_vid).subclip(0, each_video_duration)
 
-        final_clip = CompositeVideoClip(
-          [
-            bg_clip1.set_position((0, 0)),
-            bg_clip2.set_position((0, min_red_area_h)),
-            text_clip1.set_position(('center', text_clip1_y_offset)),
-            text_clip2.set_position((x_margin, text_clip2_y_offset)),
-          ],
-          size=(OUT_VIDEO_WIDTH, OUT_VIDEO_HEIGHT)
+      # Check if the video clip has valid duration
+      if video_clip.duration <= 0:
+        logging.error(
+          f"Video {considered_vid} has invalid duration {video_clip.duration}. Skipping."
         )
+        continue
 
-    # Clean up the temporary Fontconfig directory
-    try:
-      shutil.rmtree(temp_fontconfig_dir)
-    except Exception as err:
-      logging.error(f"Error removing Fontconfig directory: {err}")
+      # Apply cropping to maintain aspect ratio without distortion
+      video_clip = crop_to_aspect_ratio(
+        video_clip, OUT_VIDEO_WIDTH, OUT_VIDEO_HEIGHT
+      )
 
-    return final_clip
+      # Add the clip to the list of video clips
+      video_clips.append(video_clip)
+    except Exception as e:
+      logging.error(f"Error processing video {considered_vid}: {e}")
+      continue
 
-  except Exception as e:
-    logging.error(f"Error in create_custom_text_clip: {e}")
-    raise
+  return video_clips
 
 def process_audio_on_videos(
-  row,
   video_files,
   idx,
-  input_df,
   hook_number,
   hook_text,
   num_videos_to_use,
@@ -521,10 +251,10 @@ def process_audio_on_videos(
   word_color_data,
   audio_file=None,
   add_watermark=False,
-  is_tiktok=False
+  is_tiktok=False,
+  layout=None,
+  encoding_profile=None
 ):
-  # Remove underscores from the hook text for display
-  cleaned_hook_text = hook_text.replace('_', '')
   hook=Hook.objects.get(id=task_id)
   
   addition=int(80/total_rows)
@@ -535,11 +265,10 @@ def process_audio_on_videos(
   except:
     pass
 
-  
-  row['Input Video Filename'] = [
-    os.path.basename(considered_video) for considered_video in video_files
-  ]
-  input_df.at[idx, 'Input Video Filename'] = row['Input Video Filename']
+  logging.info(
+    f"Input videos for hook {hook_number}: "
+    f"{[os.path.basename(considered_video) for considered_video in video_files]}"
+  )
 
   # Ensure num_videos_to_use is valid and non-zero
   if num_videos_to_use <= 0:
@@ -549,101 +278,47 @@ def process_audio_on_videos(
     num_videos_to_use = 1
 
   each_video_duration = audio_clip.duration / num_videos_to_use
-  video_clips = []
   logging.debug(
     f"Audio clip duration: {audio_clip.duration}, num_videos_to_use: {num_videos_to_use}"
   )
-  for considered_vid in video_files:
-    try:
-      # Ensure the video file exists
-      if not os.path.exists(considered_vid):
-        logging.error(f"Video file {considered_vid} does not exist.")
-        continue
-
-      # Log and process the video
-      logging.info(f'Processing video: {considered_vid}')
-      video_clip = VideoFileClip(considered_vid).subclip(0, each_video_duration)
-
-      # Check if the video clip has valid duration
-      if video_clip.duration <= 0:
-        logging.error(
-          f"Video {considered_vid} has invalid duration {video_clip.duration}. Skipping."
-        )
-        continue
+  background_path = None
+  if can_stream_copy(video_files):
+    # Uniformly encoded segments are joined by stream copy, not re-encoded
+    logging.info('Joining normalized segments by stream copy')
+    background_path = assemble_background(
+      video_files, each_video_duration,
+      os.path.join(output_videos_folder, f'background_{idx}.mp4')
+    )
+    final_video_clip = VideoFileClip(background_path)
+  else:
+    video_clips = load_source_clips(
+      video_files, each_video_duration, OUT_VIDEO_WIDTH, OUT_VIDEO_HEIGHT
+    )
 
-      # Apply cropping to maintain aspect ratio without distortion
-      video_clip = crop_to_aspect_ratio(
-        video_clip, OUT_VIDEO_WIDTH, OUT_VIDEO_HEIGHT
+    # Ensure there are valid clips to concatenate
+    if not video_clips:
+      logging.error("No valid video clips were found for concatenation.")
+      raise ValueError(
+        f"No valid video clips were found for hook {hook_number}"
       )
 
-      # Add the clip to the list of video clips
-      video_clips.append(video_clip)
-    except Exception as e:
-      logging.error(f"Error processing video {considered_vid}: {e}")
-      continue
-
-  # Ensure there are valid clips to concatenate
-  if not video_clips:
-    logging.error("No valid video clips were found for concatenation.")
-    return None
-
-  logging.info('Concatenating videos')
-  final_video_clip = concatenate_videoclips(video_clips)
-  logging.info('Concatenated videos')
-
-  # Automatically adjust the font size based on video dimensions and text length
-  auto_font_size = max(
-    int(OUT_VIDEO_WIDTH / len(cleaned_hook_text) * 1.5), 20
-  )  # Simple logic to adjust font size
-
-  # Ensure correct word color data is used
-  if idx < len(word_color_data):
-    specific_word_color_data = word_color_data[idx]
-  else:
-    specific_word_color_data = [
-    ]  # Fallback to an empty list if out of range (for safety)
-
-  logging.info(f"Specific word color data: {specific_word_color_data}")
-  # Pass specific_word_color_data to the custom text clip creation
-  logging.info('Using the create_custom_text_clip method')
-  custom_text_clip = create_custom_text_clip(
-    cleaned_hook_text, OUT_VIDEO_WIDTH, OUT_VIDEO_HEIGHT, top_box_color,
-    default_text_color, auto_font_size, specific_word_color_data, is_tiktok
-  )
-  logging.info('Used the create_custom_text_clip method')
-
-  logging.info('Adding watermark to final video')
-
-  final_clip = None
-  if add_watermark:
-    watermark = ImageClip("hooks/tools/watermark.png")
-    width = custom_text_clip.size[0] + 650
-    height = width * (watermark.size[1] / watermark.size[0])
-    watermark = watermark.resize(height=height, width=width)
-    watermark = watermark.set_position("center").set_duration(
-      final_video_clip.duration
+    logging.info('Concatenating videos')
+    final_video_clip = concatenate_videoclips(video_clips)
+    logging.info('Concatenated videos')
+
+  # The layout is normally planned for the whole sheet before rendering
+  if layout is None:
+    # word_color_data holds the cells of this row only
+    logging.info(f"Specific word color data: {word_color_data}")
+    layout = compute_hook_layout(
+      LayoutRow(hook_text, word_color_data), (OUT_VIDEO_WIDTH, OUT_VIDEO_HEIGHT),
+      HookStyle(top_box_color, default_text_color, is_tiktok)
     )
+  overlay_layer = build_overlay_layer(layout, add_watermark)
 
-    logging.info('Creating a CompositeVideoClip instance')
-    final_clip = CompositeVideoClip(
-      [
-        final_video_clip.audio_fadein(0.2).audio_fadeout(0.2),
-        final_video_clip,
-        custom_text_clip,
-        watermark,
-      ]
-    ).set_audio(audio_clip).set_duration(audio_clip.duration)
-    logging.info("Created a CompositeVideoClip instance")
-  else:
-    logging.info('Creating a CompositeVideoClip instance')
-    final_clip = CompositeVideoClip(
-      [
-        final_video_clip.audio_fadein(0.2).audio_fadeout(0.2),
-        final_video_clip,
-        custom_text_clip,
-      ]
-    ).set_audio(audio_clip).set_duration(audio_clip.duration)
-    logging.info("Created a CompositeVideoClip instance")
+  final_clip = final_video_clip.fl_image(overlay_layer.apply).set_audio(
+    audio_clip
+  ).set_duration(audio_clip.duration)
 
   output_video_filename = os.path.join(output_videos_folder, f'hook_{idx}.mp4')
   logging.info(f"{output_videos_folder},'---------->output_videos_folder")
@@ -652,10 +327,16 @@ def process_audio_on_videos(
     output_video_filename,
     temp_audiofile=os.path.join(output_videos_folder, f"temp-audio_{idx}.m4a"),
     remove_temp=False,
-    codec='libx264',
-    audio_codec="aac"
+    audio_codec="aac",
+    **moviepy_write_kwargs(
+      get_encoding_profile(encoding_profile or settings.HOOK_ENCODING_PROFILE)
+    )
   )
+  if background_path:
+    final_video_clip.close()
+    os.remove(background_path)
   if initial_value+addition <=100:
     hook.track_progress(initial_value+addition)
 
   logging.info(f"Video processing completed successfully")
+  return output_video_filename
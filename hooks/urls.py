@@ -12,6 +12,9 @@ urlpatterns = [
     # URL pattern for processing a task with a specific task_id and aspect_ratio
     path('processing/<str:task_id>/<str:aspect_ratio>/', views.processing, name='processing'),
 
+    # URL pattern for a PNG preview of one sheet row of a task at an aspect_ratio
+    path('preview/<str:task_id>/<int:row>/<str:aspect_ratio>/', views.preview_hook, name='preview'),
+
     # URL pattern to check the status of a task using task_id
     path('check_status/<str:task_id>/', views.check_task_status, name='check_status'),
 
@@ -20,7 +20,9 @@ import threading
 import zipfile
 import io
 import requests
-from .tools.spreadsheet_extractor import fetch_google_sheet_data
+from .tools.sheet_cache import get_sheet_snapshot
+from .tools.preview import render_preview_png
+from .tools.utils import OUTPUT_DIMENSIONS
 from django.core.management import call_command
 import modal
 logging.basicConfig(level=logging.DEBUG)
@@ -113,9 +115,8 @@ def processing(request, task_id, aspect_ratio):
       hook.status='processing'
       hook.progress='0'
       hook.save()
-      if hook.video_links.all():
-          for link in hook.video_links.all():
-              link.delete()
+      # Existing videos are kept; the worker re-renders only the rows whose
+      # inputs changed and removes the videos no row matches any more.
     user_sub = request.user.subscription
     if not user_sub or user_sub.hooks <= 0:
         return HttpResponse("You don't have enough credits, buy and try again!", status=404)
@@ -143,10 +144,30 @@ def processing(request, task_id, aspect_ratio):
 
 
 
+@login_required
+def preview_hook(request, task_id, row, aspect_ratio):
+  """
+    View returning a PNG of one sheet row's overlay on the first video frame.
+  """
+  hook = get_object_or_404(Hook, id=task_id, user=request.user)
+  if aspect_ratio not in OUTPUT_DIMENSIONS:
+    return HttpResponse("Unsupported aspect ratio.", status=400)
+
+  try:
+    png = render_preview_png(hook, row, aspect_ratio)
+  except IndexError:
+    return HttpResponse("Row not found.", status=404)
+  except Exception as e:
+    logging.error(f"Preview of hook {task_id} failed: {e}")
+    return HttpResponse("Preview failed, please try again.", status=500)
+
+  return HttpResponse(png, content_type='image/png')
+
+
 @login_required
 def check_task_status(request, task_id):
   task = get_object_or_404(Hook, id=task_id)
-  videos=[video.video_file.url for video in task.video_links.all() if video.video_file ]
+  videos=[video.video_file.url for video in task.video_links.order_by('row_index', 'id') if video.video_file ]
   return JsonResponse(
     {
       'status': task.status,
@@ -163,7 +184,7 @@ def processing_successful(request, task_id):
   """View to display processing successful page."""
   
   task = get_object_or_404(Hook, id=task_id)
-  videos=[video.Video_link_name() for video in task.video_links.all() if video.video_file ]
+  videos=[video.Video_link_name() for video in task.video_links.order_by('row_index', 'id') if video.video_file ]
 
   return render(
     request, 'processing_successful.html', {
@@ -215,7 +236,7 @@ def download_video(request):
 
 def download_zip(request, task_id):
   task = get_object_or_404(Hook, id=task_id)
-  videos=[video.video_file.url for video in task.video_links.all() if video.video_file ]
+  videos=[video.video_file.url for video in task.video_links.order_by('row_index', 'id') if video.video_file ]
 
   zip_buffer = io.BytesIO()
   with zipfile.ZipFile(zip_buffer, 'w') as zip_file:
@@ -254,8 +275,8 @@ def validate_google_sheet_link(request):
     google_sheets_link = request.POST.get('google_sheets_link')
 
     try:
-      # Attempt to fetch the Google Sheets data for validation
-      fetch_google_sheet_data(google_sheets_link)
+      # Fetch the sheet for validation; the worker reuses the snapshot
+      get_sheet_snapshot(google_sheets_link)
       return JsonResponse({'valid': True})
     except ValueError as ve:
       return JsonResponse({'valid': False, 'error': str(ve)})
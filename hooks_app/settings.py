@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 from dotenv import dotenv_values,load_dotenv
 from django.contrib.messages import constants as messages
@@ -185,3 +186,48 @@ class MediaStorage(S3Boto3Storage):
     file_overwrite = False
 
 
+
+
+# Hook rendering
+# 'thread' renders hooks in threads of the worker process, 'process' in a pool
+# of worker processes that each hold their own interpreter (no shared GIL).
+HOOK_RENDER_BACKEND = os.getenv('HOOK_RENDER_BACKEND', 'thread')
+# 'pango' renders hook text through ImageMagick, 'pillow' in-process with FreeType.
+HOOK_TEXT_RENDERER = os.getenv('HOOK_TEXT_RENDERER', 'pango')
+# Local directory for render caches (overlays, ...), trimmed to the sizes below.
+HOOK_CACHE_DIR = os.getenv(
+    'HOOK_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'hook-cache')
+)
+HOOK_OVERLAY_CACHE_MEMORY_MB = int(os.getenv('HOOK_OVERLAY_CACHE_MEMORY_MB', '256'))
+HOOK_OVERLAY_CACHE_DISK_MB = int(os.getenv('HOOK_OVERLAY_CACHE_DISK_MB', '1024'))
+# Share rendered overlays between workers through the media bucket.
+HOOK_OVERLAY_CACHE_S3 = os.getenv('HOOK_OVERLAY_CACHE_S3', 'False') == 'True'
+# First frames of uploaded videos kept in memory for overlay previews.
+HOOK_PREVIEW_FRAME_CACHE_MB = int(os.getenv('HOOK_PREVIEW_FRAME_CACHE_MB', '128'))
+# Crop and scale each source video once per output size and reuse it for every row.
+HOOK_NORMALIZED_SEGMENTS = os.getenv('HOOK_NORMALIZED_SEGMENTS', 'True') == 'True'
+HOOK_SEGMENT_MAX_SECONDS = int(os.getenv('HOOK_SEGMENT_MAX_SECONDS', '300'))
+# Sources are normalized lazily, in prefixes of this many seconds.
+HOOK_SEGMENT_PREFIX_SECONDS = int(os.getenv('HOOK_SEGMENT_PREFIX_SECONDS', '30'))
+HOOK_SEGMENT_CACHE_DISK_MB = int(os.getenv('HOOK_SEGMENT_CACHE_DISK_MB', '8192'))
+# Default encoding profiles (see utils/encoding.py) when neither the task nor
+# its plan picks one.
+HOOK_ENCODING_PROFILE = os.getenv('HOOK_ENCODING_PROFILE', 'standard')
+MERGE_ENCODING_PROFILE = os.getenv('MERGE_ENCODING_PROFILE', 'fast')
+MERGE_PREPROCESS_ENCODING_PROFILE = os.getenv('MERGE_PREPROCESS_ENCODING_PROFILE', 'ultrafast')
+# ElevenLabs requests in flight per API key when its subscription tier cannot
+# be read; known tiers use their own limit, capped at ELEVENLABS_MAX_KEY_CONCURRENCY.
+HOOK_TTS_CONCURRENCY = int(os.getenv('HOOK_TTS_CONCURRENCY', '3'))
+ELEVENLABS_MAX_KEY_CONCURRENCY = int(os.getenv('ELEVENLABS_MAX_KEY_CONCURRENCY', '15'))
+# Retries of rate limited (429) and transient 5xx text-to-speech requests.
+ELEVENLABS_MAX_RETRIES = int(os.getenv('ELEVENLABS_MAX_RETRIES', '5'))
+# Synthesized voiceovers by voice and text, on local disk and in the media bucket.
+HOOK_AUDIO_CACHE_DISK_MB = int(os.getenv('HOOK_AUDIO_CACHE_DISK_MB', '512'))
+HOOK_AUDIO_CACHE_S3 = os.getenv('HOOK_AUDIO_CACHE_S3', 'True') == 'True'
+# Google Sheet snapshots are reused this many seconds without asking Google, and
+# longer while Drive reports the sheet unmodified. Shared with the workers via S3.
+HOOK_SHEET_CACHE_TTL = int(os.getenv('HOOK_SHEET_CACHE_TTL', '60'))
+HOOK_SHEET_CACHE_S3 = os.getenv('HOOK_SHEET_CACHE_S3', 'True') == 'True'
+# Rows per request when a worker reads a sheet that is not cached; the first
+# hooks start while later pages are still being fetched.
+HOOK_SHEET_PAGE_ROWS = int(os.getenv('HOOK_SHEET_PAGE_ROWS', '200'))
@@ -11,6 +11,8 @@ from django.conf import settings
 import requests
 import boto3
 from merger.models import MergeTask, VideoLinks
+from utils.encoding import ffmpeg_video_args, get_encoding_profile, resolve_encoding_profile
+from utils.probe import probe_media
 import logging
 import os
 import tempfile
@@ -108,60 +110,33 @@ class Command(BaseCommand):
         """
         Check if the video file has an audio stream.
         """
-        command = [
-            "ffprobe", "-v", "error",
-            "-select_streams", "a:0",
-            "-show_entries", "stream=codec_type",
-            "-of", "csv=p=0",
-            video_file,
-        ]
         try:
-            result = subprocess.run(
-                command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True
-            )
-            output = result.stdout.strip()
-            return output == "audio"
+            return probe_media(video_file).has_audio
         except subprocess.CalledProcessError as e:
             logging.error(f"FFprobe error when checking audio for {video_file}: {e.stderr.strip()}")
             return False
 
     def check_video_format_resolution(self,video_file):
         """
-        Uses ffprobe to retrieve the width and height of the first video stream.
+        Retrieves the width and height of the first video stream from the probe cache.
         Ensures that both width and height are even numbers.
         """
-        command = [
-            "ffprobe", "-v", "error",
-            "-select_streams", "v:0",
-            "-show_entries", "stream=width,height",
-            "-of", "csv=p=0:s=x",
-            video_file
-        ]
         try:
-            result = subprocess.run(
-                command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True
-            )
-            output = result.stdout.strip().split('\n')
-            resolutions = [line.strip() for line in output if 'x' in line and line.strip()]
-            if resolutions:
-                try:
-                    width_str, height_str = resolutions[0].split('x')[:2]
-                    width = int(width_str.strip())
-                    height = int(height_str.strip())
-                    # Ensure dimensions are even
-                    width = width if width % 2 == 0 else width + 1
-                    height = height if height % 2 == 0 else height + 1
-                    return width, height
-                except ValueError as e:
-                    logging.error(f"Error parsing resolution: {resolutions[0]} - {e}")
-                    return None, None
-            else:
-                logging.error(f"Could not determine resolution for video: {video_file}")
-                return None, None
+            media_info = probe_media(video_file)
         except subprocess.CalledProcessError as e:
             logging.error(f"FFprobe error for {video_file}: {e.stderr.strip()}")
             return None, None
 
+        if not media_info.width or not media_info.height:
+            logging.error(f"Could not determine resolution for video: {video_file}")
+            return None, None
+
+        width, height = media_info.width, media_info.height
+        # Ensure dimensions are even
+        width = width if width % 2 == 0 else width + 1
+        height = height if height % 2 == 0 else height + 1
+        return width, height
+
     def concatenate_videos(self, video, per_vid):
             """
             Concatenates multiple video files into a single output file using FFmpeg's concat filter.
@@ -195,8 +170,9 @@ class Command(BaseCommand):
                         '-filter_complex', filter_complex,
                         '-map', '[outv]',
                         '-map', '[outa]',
-                        '-c:v', 'libx264',
-                        '-preset', 'superfast',
+                        *ffmpeg_video_args(resolve_encoding_profile(
+                            merge_task, settings.MERGE_ENCODING_PROFILE
+                        )),
                         '-c:a', 'aac',
                         '-pix_fmt', 'yuv420p',
                         '-r', '30',
@@ -291,6 +267,9 @@ class Command(BaseCommand):
         logging.info(f"Preprocessing video: {input_file}")
 
         input_has_audio = self.has_audio(input_file)
+        preprocess_profile = get_encoding_profile(
+            settings.MERGE_PREPROCESS_ENCODING_PROFILE
+        )
         with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as temp_file:
             output_file = temp_file.name  # Temporary file for the output video
 
@@ -308,7 +287,7 @@ class Command(BaseCommand):
                     command += ["-vf", vf_filter]
 
                 command += [
-                    "-c:v", "libx264", "-preset", "ultrafast",
+                    *ffmpeg_video_args(preprocess_profile),
                     "-c:a", "aac", "-pix_fmt", "yuv420p",
                     "-r", "30",  # Enforce frame rate
                     output_file
@@ -329,7 +308,7 @@ class Command(BaseCommand):
                     command += ["-vf", vf_filter]
 
                 command += [
-                    "-c:v", "libx264", "-preset", "ultrafast",
+                    *ffmpeg_video_args(preprocess_profile),
                     "-c:a", "aac", "-shortest",
                     "-pix_fmt", "yuv420p", "-r", "30",  # Enforce frame rate
                     output_file
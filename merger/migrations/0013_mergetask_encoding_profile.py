@@ -0,0 +1,18 @@
+# Generated by Django 4.2.17 on 2026-10-18 13:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('merger', '0012_largevideo_processed_file_shortvideo_processed_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mergetask',
+            name='encoding_profile',
+            field=models.CharField(blank=True, choices=[('ultrafast', 'ultrafast'), ('fast', 'fast'), ('standard', 'standard'), ('quality', 'quality')], max_length=20, null=True),
+        ),
+    ]
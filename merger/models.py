@@ -2,6 +2,7 @@ import os
 from django.db import connection, models
 from django.utils import timezone
 
+from utils.encoding import ENCODING_PROFILE_CHOICES
 from utils.utils import sanitize_filename
 def output_merger_video(instance,filename):
     return os.path.join("output_merger_video", str(instance.id), sanitize_filename(filename))
@@ -25,6 +26,11 @@ class MergeTask(models.Model):
     percent_done = models.IntegerField(default=0)
     
     total_frames = models.IntegerField(default=0)
+    # Encoder profile for the merged output; empty means the plan's profile
+    # or MERGE_ENCODING_PROFILE.
+    encoding_profile = models.CharField(
+        max_length=20, choices=ENCODING_PROFILE_CHOICES, blank=True, null=True
+    )
     def track_progress(self, increase):
         # frame_per=0
         if self.total_frames >0:
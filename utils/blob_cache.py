@@ -0,0 +1,193 @@
+# Content-addressed caches: an in-memory LRU tier and a disk/S3 blob tier
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+logging.basicConfig(level=logging.DEBUG)
+
+# Eviction trims the directory to this share of its limit, so a full cache is
+# not walked again on the very next write.
+EVICT_TO_FRACTION = 0.9
+
+
+class LRUCache:
+    """Thread-safe LRU of Python objects, bounded by the total of `sizeof`."""
+
+    def __init__(self, max_bytes, sizeof=len):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                self._bytes -= self.sizeof(self._items.pop(key))
+            self._items[key] = value
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= self.sizeof(evicted)
+
+
+class BlobCache:
+    """
+    Bytes keyed by content hash, kept in a local directory that is trimmed
+    back to `max_disk_bytes` (least recently used first) and optionally
+    mirrored to S3 under `s3_prefix` so other workers can reuse them.
+    """
+
+    def __init__(self, namespace, max_disk_bytes, directory=None, s3_prefix=None):
+        self.directory = os.path.join(
+            directory or settings.HOOK_CACHE_DIR, namespace
+        )
+        self.max_disk_bytes = max_disk_bytes
+        self.s3_prefix = s3_prefix
+        self._lock = threading.Lock()
+        # Bytes on disk, counted once and then kept up to date on writes
+        self._disk_bytes = None
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def _s3_key(self, key):
+        return f"{self.s3_prefix.rstrip('/')}/{key[:2]}/{key}"
+
+    def get(self, key):
+        """Return the cached bytes for `key`, or None."""
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)  # mark as recently used for eviction
+            return data
+        except FileNotFoundError:
+            pass
+
+        if not self.s3_prefix:
+            return None
+
+        from utils.utils import create_s3_client
+        try:
+            response = create_s3_client().get_object(
+                Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=self._s3_key(key)
+            )
+            data = response['Body'].read()
+        except Exception as err:
+            logging.debug(f"Cache miss on S3 for {key}: {err}")
+            return None
+
+        self._write_local(key, data)
+        return data
+
+    def set(self, key, data):
+        """Store `data` under `key` locally and, when configured, on S3."""
+        self._write_local(key, data)
+
+        if not self.s3_prefix:
+            return
+
+        from utils.utils import create_s3_client
+        try:
+            create_s3_client().put_object(
+                Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=self._s3_key(key),
+                Body=data
+            )
+        except Exception as err:
+            logging.error(f"Failed to upload cache entry {key} to S3: {err}")
+
+    def local_path(self, key):
+        """Path of the local copy of `key`, or None. For entries too big to read into memory."""
+        path = self.path(key)
+        try:
+            os.utime(path)  # mark as recently used for eviction
+        except FileNotFoundError:
+            return None
+        return path
+
+    def set_file(self, key, file_path):
+        """Move `file_path` into the cache as `key` and return its cached path."""
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        replaced = self._local_size(path)
+        os.replace(file_path, path)
+        self._grew(self._local_size(path) - replaced)
+        return path
+
+    def _write_local(self, key, data):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so concurrent readers never see a partial file.
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        replaced = self._local_size(path)
+        os.replace(temp_path, path)
+        self._grew(len(data) - replaced)
+
+    @staticmethod
+    def _local_size(path):
+        try:
+            return os.stat(path).st_size
+        except FileNotFoundError:
+            return 0
+
+    def _scan(self):
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        return entries, total
+
+    def _grew(self, size):
+        """
+        Account for `size` more bytes on disk. The directory is only walked
+        once per process and again when the running total goes over the
+        limit, since other workers may share it.
+        """
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan()[1]
+            else:
+                self._disk_bytes += size
+            if self._disk_bytes > self.max_disk_bytes:
+                self._disk_bytes = self._evict()
+
+    def _evict(self):
+        entries, total = self._scan()
+        if total <= self.max_disk_bytes:
+            return total
+
+        target = self.max_disk_bytes * EVICT_TO_FRACTION
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            if total <= target:
+                break
+        return total
@@ -0,0 +1,91 @@
+import logging
+from collections import namedtuple
+
+from django.conf import settings
+
+EncodingProfile = namedtuple('EncodingProfile', [
+    'name',
+    'preset',     # libx264 speed/size trade-off
+    'crf',        # constant quality; ignored when `bitrate` is set
+    'bitrate',    # e.g. '6M' for a target bitrate instead of CRF
+    'threads',    # 0 lets libx264 pick
+    'tune',       # e.g. 'film', or None
+    'gop',        # keyframe interval in frames, None for the encoder default
+    'faststart',  # move the moov atom to the front for progressive playback
+])
+
+# The one place the encoder settings of both pipelines are defined.
+ENCODING_PROFILES = {
+    profile.name: profile for profile in [
+        # Intermediates that are decoded again right away
+        EncodingProfile('ultrafast', 'ultrafast', 23, None, 0, None, None, False),
+        # Cheap deliverables, e.g. free-plan watermark renders
+        EncodingProfile('fast', 'superfast', 23, None, 0, None, None, True),
+        # libx264 defaults, what hook renders always used
+        EncodingProfile('standard', 'medium', 23, None, 0, None, None, True),
+        EncodingProfile('quality', 'slow', 18, None, 0, 'film', None, True),
+    ]
+}
+
+ENCODING_PROFILE_CHOICES = [(name, name) for name in ENCODING_PROFILES]
+
+
+def get_encoding_profile(name):
+    """
+    Return the named EncodingProfile, falling back to HOOK_ENCODING_PROFILE
+    for unknown names.
+    """
+    profile = ENCODING_PROFILES.get(name)
+    if profile is None:
+        logging.warning(f"Unknown encoding profile {name!r}, using the default")
+        profile = ENCODING_PROFILES[settings.HOOK_ENCODING_PROFILE]
+    return profile
+
+
+def resolve_encoding_profile(task, default):
+    """
+    The profile for a hook or merge task: set on the task, else on the
+    user's plan, else `default` (a profile name from settings).
+    """
+    name = getattr(task, 'encoding_profile', None)
+    if not name and task.user and task.user.subscription:
+        name = task.user.subscription.plan.encoding_profile
+    return get_encoding_profile(name or default)
+
+
+def ffmpeg_video_args(profile):
+    """ffmpeg output options encoding the video stream with `profile`."""
+    args = ['-c:v', 'libx264', '-preset', profile.preset]
+    if profile.bitrate:
+        args += ['-b:v', profile.bitrate]
+    else:
+        args += ['-crf', str(profile.crf)]
+    if profile.threads:
+        args += ['-threads', str(profile.threads)]
+    if profile.tune:
+        args += ['-tune', profile.tune]
+    if profile.gop:
+        args += ['-g', str(profile.gop)]
+    if profile.faststart:
+        args += ['-movflags', '+faststart']
+    return args
+
+
+def moviepy_write_kwargs(profile):
+    """Keyword arguments for moviepy's write_videofile encoding with `profile`."""
+    ffmpeg_params = []
+    if not profile.bitrate:
+        ffmpeg_params += ['-crf', str(profile.crf)]
+    if profile.tune:
+        ffmpeg_params += ['-tune', profile.tune]
+    if profile.gop:
+        ffmpeg_params += ['-g', str(profile.gop)]
+    if profile.faststart:
+        ffmpeg_params += ['-movflags', '+faststart']
+    return {
+        'codec': 'libx264',
+        'preset': profile.preset,
+        'bitrate': profile.bitrate,
+        'threads': profile.threads or None,
+        'ffmpeg_params': ffmpeg_params,
+    }
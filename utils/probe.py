@@ -0,0 +1,153 @@
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import threading
+from collections import namedtuple
+from urllib.parse import urlparse, urlunparse
+
+from utils.blob_cache import BlobCache, LRUCache
+
+# Bump when MediaInfo or the way it is read changes.
+PROBE_CACHE_VERSION = 1
+
+MediaInfo = namedtuple('MediaInfo', [
+    'duration',   # seconds, from the container
+    'width',      # coded size of the first video stream, None without video
+    'height',
+    'fps',
+    'rotation',   # degrees clockwise from the display matrix or rotate tag
+    'has_audio',
+    'has_video',
+])
+
+_hashes = {}
+_hashes_lock = threading.Lock()
+_memory = LRUCache(4096, sizeof=lambda info: 1)
+_blobs = None
+
+
+def file_content_hash(path, chunk_size=1024 * 1024):
+    """
+    sha256 of a file's content. Remembered per (path, size, mtime) so a file
+    is only read once per process.
+    """
+    stat = os.stat(path)
+    stamp = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _hashes_lock:
+        if stamp in _hashes:
+            return _hashes[stamp]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    content_hash = digest.hexdigest()
+
+    with _hashes_lock:
+        _hashes[stamp] = content_hash
+    return content_hash
+
+
+def probe_cache_key(source):
+    """
+    Cache key of a media file: its content hash for local files, the URL
+    without its query string (presigned URLs change, the object does not) for
+    remote ones.
+    """
+    parsed = urlparse(source)
+    if parsed.scheme in ('http', 'https', 's3'):
+        identity = 'url:' + urlunparse(parsed._replace(query='', fragment=''))
+    else:
+        identity = 'sha256:' + file_content_hash(source)
+    return hashlib.sha256(
+        f"{PROBE_CACHE_VERSION}:{identity}".encode('utf-8')
+    ).hexdigest()
+
+
+def _parse_rate(rate):
+    num, _, den = (rate or '0/1').partition('/')
+    try:
+        num, den = float(num), float(den or 1)
+    except ValueError:
+        return None
+    return num / den if num > 0 and den > 0 else None
+
+
+def _parse_rotation(stream):
+    for side_data in stream.get('side_data_list', []):
+        if 'rotation' in side_data:
+            return int(-float(side_data['rotation'])) % 360
+    rotate = stream.get('tags', {}).get('rotate')
+    return int(rotate) % 360 if rotate else 0
+
+
+def run_ffprobe(source):
+    """
+    Uses ffprobe to read the MediaInfo of a media file, without decoding it.
+    """
+    command = [
+        'ffprobe', '-v', 'error',
+        '-show_entries',
+        'format=duration:stream=codec_type,width,height,r_frame_rate'
+        ':stream_tags=rotate:stream_side_data=rotation',
+        '-of', 'json',
+        source,
+    ]
+    result = subprocess.run(
+        command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True
+    )
+    info = json.loads(result.stdout)
+    streams = info.get('streams', [])
+    video = next((s for s in streams if s.get('codec_type') == 'video'), None)
+
+    return MediaInfo(
+        duration=float(info.get('format', {}).get('duration') or 0),
+        width=video.get('width') if video else None,
+        height=video.get('height') if video else None,
+        fps=_parse_rate(video.get('r_frame_rate')) if video else None,
+        rotation=_parse_rotation(video) if video else 0,
+        has_audio=any(s.get('codec_type') == 'audio' for s in streams),
+        has_video=video is not None,
+    )
+
+
+def display_size(info):
+    """(width, height) of a video as played, with its rotation applied."""
+    if info.rotation in (90, 270):
+        return info.height, info.width
+    return info.width, info.height
+
+
+def _get_blobs():
+    global _blobs
+    if _blobs is None:
+        _blobs = BlobCache('probes', 16 * 1024 * 1024)
+    return _blobs
+
+
+def probe_media(source):
+    """
+    MediaInfo of a local path or URL, from the in-process cache, then the
+    on-disk probe cache, and only then from ffprobe.
+    """
+    key = probe_cache_key(source)
+    info = _memory.get(key)
+    if info is not None:
+        return info
+
+    data = _get_blobs().get(key)
+    if data is not None:
+        try:
+            info = MediaInfo(**json.loads(data))
+        except (TypeError, ValueError) as e:
+            logging.error(f"Ignoring unreadable probe cache entry for {source}: {e}")
+            info = None
+
+    if info is None:
+        info = run_ffprobe(source)
+        _get_blobs().set(key, json.dumps(info._asdict()).encode('utf-8'))
+
+    _memory.set(key, info)
+    return info